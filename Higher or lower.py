@@ -1,6 +1,28 @@
+import argparse
+import cProfile
+import csv
+import gzip
+import hashlib
+import json
 import mysql.connector
+import pstats
+import random
+import re
+import struct
+import threading
 import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 
@@ -19,6 +41,7 @@ class GameMode(Enum):
     CLASSIC = "classic"
     SUDDEN_DEATH = "sudden_death"
     TIME_ATTACK = "time_attack"
+    RACE = "race"
 
 
 class GameSettings:
@@ -28,10 +51,22 @@ class GameSettings:
         self.LIVES_CLASSIC = 3
         self.LIVES_OTHER = 1
         self.TIME_ATTACK_DURATION = 60.0
+        self.RACE_TARGET = 20
 
 
 class GameState:
 
+    __slots__ = (
+        'score', 'lives', 'current_item', 'next_item', 'question_type', 'game_over', 'high_score',
+        'game_mode', 'player_id', 'player_username', 'show_current_value', 'first_guess',
+        'time_remaining', 'start_time'
+    )
+
+    # versio, kysymystyyppi, pelimuoto, liput, pisteet, elämät, ennätys, pelaaja, aikaa jäljellä, aloitusaika
+    _RAKENNE = struct.Struct('<BBBBiiiqdd')
+    _VERSIO = 1
+    _EI_ARVOA = 0xFF
+
     def __init__(self):
         self.score = 0
         self.lives = 3
@@ -48,48 +83,343 @@ class GameState:
         self.time_remaining = 0
         self.start_time = 0
 
+    def pack(self):
+
+        question_types = list(QuestionType)
+        flags = self.game_over | (self.show_current_value << 1) | (self.first_guess << 2)
+        username = self.player_username.encode('utf-8')
+
+        return self._RAKENNE.pack(
+            self._VERSIO,
+            question_types.index(self.question_type) if self.question_type else self._EI_ARVOA,
+            list(GameMode).index(self.game_mode),
+            flags,
+            self.score,
+            self.lives,
+            self.high_score,
+            self.player_id if self.player_id is not None else -1,
+            self.time_remaining,
+            self.start_time
+        ) + struct.pack('<H', len(username)) + username
+
+    @classmethod
+    def unpack(cls, data, offset=0):
+
+        (version, question_type, game_mode, flags, score, lives, high_score,
+         player_id, time_remaining, start_time) = cls._RAKENNE.unpack_from(data, offset)
+        if version != cls._VERSIO:
+            raise ValueError(f"Tuntematon tallennusversio {version}")
+        offset += cls._RAKENNE.size
+
+        (length,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+
+        state = cls()
+        state.question_type = list(QuestionType)[question_type] if question_type != cls._EI_ARVOA else None
+        state.game_mode = list(GameMode)[game_mode]
+        state.game_over = bool(flags & 1)
+        state.show_current_value = bool(flags & 2)
+        state.first_guess = bool(flags & 4)
+        state.score = score
+        state.lives = lives
+        state.high_score = high_score
+        state.player_id = player_id if player_id >= 0 else None
+        state.time_remaining = time_remaining
+        state.start_time = start_time
+        state.player_username = bytes(data[offset:offset + length]).decode('utf-8')
+        return state, offset + length
+
 
 
 # TIETOKANTA
 
 
+def _keskiarvo(total, count):
+
+    if not count or total is None:
+        return 0
+    return round(Decimal(total) / count, 1)
+
+
+class UsernameIndex:
+    """Lajiteltu käyttäjänimilista etuliitehakuihin; haku on kaksi bisect-kutsua"""
+
+    LOAD_CHUNK = 50000
+
+    def __init__(self):
+        # (vertailuavain, käyttäjänimi) -pareina yhdessä listassa, jotta lisäys on yksi operaatio
+        self.entries = []
+        self.max_id = 0
+        self.ladattu = False
+
+    def lataa(self, db):
+        """Lataa edellisen latauksen jälkeen lisätyt pelaajat; palauttaa uusien id:t (ensimmäisellä kerralla tyhjän)"""
+
+        sql = "SELECT id, username FROM players WHERE id > %s ORDER BY id"
+        initial = not self.ladattu
+        loaded = []
+        for rows in db.suorita_kysely_paloittain(sql, (self.max_id,), self.LOAD_CHUNK):
+            for player_id, username in rows:
+                if initial:
+                    self.entries.append((username.casefold(), username))
+                else:
+                    self.lisaa(username)
+                    loaded.append(player_id)
+            self.max_id = rows[-1][0]
+
+        if initial:
+            self.entries.sort()
+            self.ladattu = True
+        return loaded
+
+    def lisaa(self, username, player_id=None):
+
+        entry = (username.casefold(), username)
+        index = bisect_left(self.entries, entry)
+        if index == len(self.entries) or self.entries[index] != entry:
+            self.entries.insert(index, entry)
+        if player_id and player_id > self.max_id:
+            self.max_id = player_id
+
+    def hae(self, prefix, limit=10):
+
+        key = prefix.casefold()
+        start = bisect_left(self.entries, (key,))
+        end = bisect_left(self.entries, (key + '\U0010ffff',), start)
+        return [username for _, username in self.entries[start:min(end, start + limit)]]
+
+
 class DatabaseManager:
 
-    def __init__(self, host="127.0.0.1", user="pythonUser", password="salasana", database="flight_game"):
+    LISATAULUT = [
+        """
+        CREATE TABLE IF NOT EXISTS high_score_rollup
+        (
+            player_id    INT         NOT NULL,
+            game_mode    VARCHAR(20) NOT NULL,
+            games_played INT         NOT NULL,
+            score_total  BIGINT      NOT NULL,
+            best_score   INT         NOT NULL,
+            worst_score  INT         NOT NULL,
+            PRIMARY KEY (player_id, game_mode)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS high_score_hall_of_fame
+        (
+            id        INT PRIMARY KEY,
+            player_id INT         NOT NULL,
+            score     INT         NOT NULL,
+            game_mode VARCHAR(20) NOT NULL,
+            played_at TIMESTAMP   NOT NULL,
+            KEY hall_of_fame_mode_score_idx (game_mode, score)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS item_accuracy
+        (
+            question_type VARCHAR(20) NOT NULL,
+            item_key      VARCHAR(40) NOT NULL,
+            correct       INT         NOT NULL DEFAULT 0,
+            incorrect     INT         NOT NULL DEFAULT 0,
+            PRIMARY KEY (question_type, item_key)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS game_sessions
+        (
+            player_id  INT PRIMARY KEY,
+            data       BLOB      NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """
+    ]
+
+    # --setup luo nämä; pelin kyselyt olettavat niiden olevan olemassa
+    ASENNUKSEN_TAULUT = (
+        'high_score_rollup', 'high_score_hall_of_fame', 'item_accuracy', 'game_sessions', 'game_airport', 'game_country'
+    )
+
+    def __init__(self, host="127.0.0.1", user="pythonUser", password="salasana", database="flight_game", port=3306,
+                 read_replicas=None, read_your_writes_seconds=10.0):
         self.config = {
             'host': host,
+            'port': port,
             'user': user,
             'password': password,
             'database': database
         }
         self.connection = None
 
+        # lukukopiot annetaan config-avaimina, jotka korvaavat pääkannan asetukset (esim. {'port': 3307})
+        self.read_replicas = read_replicas or []
+        self.read_connections = []
+        self.read_index = 0
+        self.kiinnitetty_lukuyhteys = None
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.viimeisimmat_kirjoitukset = {}
+        self.kayttajanimi_indeksi = None
+        # suorita_kysely palauttaa virheessä tyhjän listan; tästä kutsuja erottaa sen tyhjästä tuloksesta
+        self.viimeisin_virhe = None
+
     def connect(self):
 
         try:
             self.connection = mysql.connector.connect(**self.config)
-            return True
         except mysql.connector.Error:
             return False
 
+        for replica in self.read_replicas:
+            try:
+                # lukuyhteydet eivät avaa pitkäikäistä transaktiota, joten ne näkevät replikoidut muutokset
+                self.read_connections.append(mysql.connector.connect(**dict(self.config, **replica, autocommit=True)))
+            except mysql.connector.Error:
+                print(f"Lukukopioon {replica} ei saatu yhteyttä, luetaan pääkannasta")
+
+        return True
+
+    def luo_lisataulut(self):
+
+        for sql in self.LISATAULUT:
+            try:
+                self.suorita_paivitys(sql)
+            except mysql.connector.Error as err:
+                print(f"Taulun luonti epäonnistui: {err}")
+                return False
+        return True
+
+    def puuttuvat_taulut(self):
+
+        sql = "SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()"
+        rows = self.suorita_kysely(sql, primary=True)
+        if self.viimeisin_virhe:
+            return []
+
+        # osa mysql-connectorin versioista palauttaa information_schema-sarakkeet tavuina
+        existing = {bytes(row[0]).decode() if isinstance(row[0], (bytes, bytearray)) else row[0] for row in rows}
+        return [table for table in self.ASENNUKSEN_TAULUT if table not in existing]
+
+    def tarkista_asennus(self):
+
+        # ilman näitä tauluja pistekyselyt epäonnistuisivat hiljaa: pistetaulu näyttäisi tyhjältä
+        # ja jokainen tulos olisi "uusi ennätys"
+        missing = self.puuttuvat_taulut()
+        if missing:
+            print(f"Tietokannasta puuttuu pelin tauluja: {', '.join(missing)}")
+            print('Luo ne ensin komennolla: python "Higher or lower.py" --setup')
+            return False
+        return True
+
     def close(self):
 
+        for connection in self.read_connections:
+            if connection.is_connected():
+                connection.close()
+        self.read_connections = []
+
         if self.connection and self.connection.is_connected():
             self.connection.close()
 
-    def suorita_kysely(self, query, params=None):
+    def lukuyhteys(self):
+
+        if self.kiinnitetty_lukuyhteys is not None:
+            return self.kiinnitetty_lukuyhteys
+        if not self.read_connections:
+            return self.connection
+
+        self.read_index = (self.read_index + 1) % len(self.read_connections)
+        return self.read_connections[self.read_index]
+
+    def hylkaa_lukuyhteys(self, connection, err):
+
+        # katkennut lukukopio poistetaan kierrosta; muut virheet (esim. puuttuva taulu) eivät johdu yhteydestä
+        if not isinstance(err, (mysql.connector.OperationalError, mysql.connector.InterfaceError)):
+            return
+        if connection in self.read_connections:
+            self.read_connections.remove(connection)
+            print("Lukukopion yhteys katkesi, luetaan pääkannasta")
+        if connection is self.kiinnitetty_lukuyhteys:
+            # pääkanta on aina vähintään yhtä ajan tasalla kuin mikään kopio
+            self.kiinnitetty_lukuyhteys = self.connection
+
+    def kiinnita_lukuyhteys(self):
+        """Ohjaa kaikki lukukyselyt samaan yhteyteen, jotta ne näkevät saman replikointitilanteen"""
+
+        self.kiinnitetty_lukuyhteys = None
+        self.kiinnitetty_lukuyhteys = self.lukuyhteys()
+
+    def merkitse_kirjoitus(self, player_id):
+
+        if self.read_your_writes_seconds:
+            self.viimeisimmat_kirjoitukset[player_id] = time.monotonic()
+
+    def kirjoitettu_askettain(self, player_id):
+
+        written_at = self.viimeisimmat_kirjoitukset.get(player_id)
+        if written_at is None:
+            return False
+        if time.monotonic() - written_at > self.read_your_writes_seconds:
+            del self.viimeisimmat_kirjoitukset[player_id]
+            return False
+        return True
+
+    def suorita_kysely(self, query, params=None, primary=False):
 
         if not self.connection:
             return []
 
-        cursor = self.connection.cursor()
+        connection = self.connection if primary else self.lukuyhteys()
+        cursor = None
         try:
+            # katkenneen yhteyden virhe nousee jo cursor()-kutsusta
+            cursor = connection.cursor()
             cursor.execute(query, params or ())
-            return cursor.fetchall()
+            rows = cursor.fetchall()
+            self.viimeisin_virhe = None
+            return rows
         except mysql.connector.Error as err:
+            if connection is not self.connection:
+                self.hylkaa_lukuyhteys(connection, err)
+                return self.suorita_kysely(query, params, primary=True)
+            self.viimeisin_virhe = err
             return []
         finally:
+            if cursor is not None:
+                cursor.close()
+
+    def suorita_kysely_paloittain(self, query, params=None, chunk_size=10000):
+
+        if not self.connection:
+            return
+
+        connection = self.lukuyhteys()
+        try:
+            cursor = self._avaa_kysely(connection, query, params)
+        except mysql.connector.Error as err:
+            if connection is self.connection:
+                raise
+            # lukukopion virhe ennen ensimmäistä riviä: kysely toistetaan pääkannassa
+            self.hylkaa_lukuyhteys(connection, err)
+            cursor = self._avaa_kysely(self.connection, query, params)
+
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def _avaa_kysely(self, connection, query, params):
+
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params or ())
+        except mysql.connector.Error:
             cursor.close()
+            raise
+        return cursor
 
     def suorita_paivitys(self, query, params=None):
 
@@ -110,7 +440,10 @@ class DatabaseManager:
             if self.suorita_paivitys(sql, (username,)):
                 cursor = self.connection.cursor()
                 cursor.execute("SELECT LAST_INSERT_ID()")
-                return cursor.fetchone()[0]
+                player_id = cursor.fetchone()[0]
+                if self.kayttajanimi_indeksi is not None:
+                    self.kayttajanimi_indeksi.lisaa(username, player_id)
+                return player_id
             return None
         except mysql.connector.IntegrityError:
             print(f"Käyttäjänimi '{username}' on jo olemassa!")
@@ -120,6 +453,9 @@ class DatabaseManager:
 
         sql = "SELECT id, username, created_at FROM players WHERE username = %s"
         result = self.suorita_kysely(sql, (username,))
+        if not result and self.read_connections:
+            # juuri luotu pelaaja ei välttämättä ole vielä ehtinyt lukukopioon
+            result = self.suorita_kysely(sql, (username,), primary=True)
 
         if result:
             return {
@@ -142,12 +478,42 @@ class DatabaseManager:
     def tallenna_score(self, player_id, score, game_mode='classic'):
 
         sql = "INSERT INTO high_scores (player_id, score, game_mode) VALUES (%s, %s, %s)"
-        return self.suorita_paivitys(sql, (player_id, score, game_mode))
+        saved = self.suorita_paivitys(sql, (player_id, score, game_mode))
+        self.merkitse_kirjoitus(player_id)
+        return saved
+
+    def hae_viimeisin_score_id(self):
+
+        result = self.suorita_kysely("SELECT MAX(id) FROM high_scores")
+        if result and result[0][0] is not None:
+            return result[0][0]
+        return 0
+
+    def hae_muuttuneet_pelaajat(self, since_id):
+
+        sql = "SELECT player_id, MAX(id) FROM high_scores WHERE id > %s GROUP BY player_id"
+        results = self.suorita_kysely(sql, (since_id,))
+        return {row[0]: row[1] for row in results}
+
+    # Vanhat rivit on koottu high_score_rollup-tauluun (ks. HighScoreMaintenance), joten
+    # pelaajakohtaiset kyselyt yhdistävät tuoreet rivit ja koosteet.
 
     def etsi_pelaajan_highscore(self, player_id, game_mode='classic'):
 
-        sql = "SELECT MAX(score) FROM high_scores WHERE player_id = %s AND game_mode = %s"
-        result = self.suorita_kysely(sql, (player_id, game_mode))
+        sql = """
+              SELECT MAX(best_score)
+              FROM (SELECT MAX(score) as best_score \
+                    FROM high_scores \
+                    WHERE player_id = %s \
+                      AND game_mode = %s \
+                    UNION ALL \
+                    SELECT best_score \
+                    FROM high_score_rollup \
+                    WHERE player_id = %s \
+                      AND game_mode = %s) t \
+              """
+        result = self.suorita_kysely(sql, (player_id, game_mode, player_id, game_mode),
+                                     primary=self.kirjoitettu_askettain(player_id))
         if result and result[0][0] is not None:
             return result[0][0]
         return 0
@@ -155,26 +521,29 @@ class DatabaseManager:
     def etsi_pelaajan_tilastot(self, player_id):
 
         sql = """
-              SELECT COUNT(*)   as games_played, \
-                     MAX(score) as best_score,
-                     AVG(score) as avg_score, \
-                     MIN(score) as worst_score
-              FROM high_scores \
-              WHERE player_id = %s \
+              SELECT SUM(games_played) as games_played, \
+                     MAX(best_score)   as best_score,
+                     SUM(score_total)  as score_total, \
+                     MIN(worst_score)  as worst_score
+              FROM (SELECT COUNT(*)   as games_played, \
+                           MAX(score) as best_score, \
+                           SUM(score) as score_total, \
+                           MIN(score) as worst_score \
+                    FROM high_scores \
+                    WHERE player_id = %s \
+                    UNION ALL \
+                    SELECT games_played, best_score, score_total, worst_score \
+                    FROM high_score_rollup \
+                    WHERE player_id = %s) t \
               """
-        result = self.suorita_kysely(sql, (player_id,))
+        result = self.suorita_kysely(sql, (player_id, player_id), primary=self.kirjoitettu_askettain(player_id))
 
         if result and result[0]:
-            avg_score = result[0][2]
-            if avg_score is not None:
-                avg_score = round(avg_score, 1)
-            else:
-                avg_score = 0
-
+            games_played = int(result[0][0] or 0)
             return {
-                'games_played': result[0][0] or 0,
+                'games_played': games_played,
                 'best_score': result[0][1] or 0,
-                'avg_score': avg_score,
+                'avg_score': _keskiarvo(result[0][2], games_played),
                 'worst_score': result[0][3] or 0
             }
         return {'games_played': 0, 'best_score': 0, 'avg_score': 0, 'worst_score': 0}
@@ -182,14 +551,21 @@ class DatabaseManager:
     def etsi_top_scoret(self, limit=10, game_mode='classic'):
 
         sql = """
-              SELECT p.username, h.score, h.played_at
-              FROM high_scores h
-                       JOIN players p ON h.player_id = p.id
-              WHERE h.game_mode = %s
-              ORDER BY h.score DESC
+              SELECT p.username, t.score, t.played_at
+              FROM ((SELECT player_id, score, played_at \
+                     FROM high_scores \
+                     WHERE game_mode = %s \
+                     ORDER BY score DESC LIMIT %s) \
+                    UNION ALL \
+                    (SELECT player_id, score, played_at \
+                     FROM high_score_hall_of_fame \
+                     WHERE game_mode = %s \
+                     ORDER BY score DESC LIMIT %s)) t
+                       JOIN players p ON t.player_id = p.id
+              ORDER BY t.score DESC
                   LIMIT %s \
               """
-        results = self.suorita_kysely(sql, (game_mode, limit))
+        results = self.suorita_kysely(sql, (game_mode, limit, game_mode, limit, limit))
 
         scores = []
         for row in results:
@@ -200,10 +576,67 @@ class DatabaseManager:
             })
         return scores
 
+    STATS_CHUNK = 1000
+
+    def etsi_kaikkien_tilastot(self, player_ids=None):
+        """Pelaajien tilastot; myös pelaajat ilman pelejä saavat nollarivin kuten etsi_pelaajan_tilastot"""
+
+        if player_ids is None:
+            return self._etsi_tilastot("", ())
+
+        player_ids = sorted(player_ids)
+        stats = {}
+        for start in range(0, len(player_ids), self.STATS_CHUNK):
+            chunk = player_ids[start:start + self.STATS_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            stats.update(self._etsi_tilastot(f"WHERE player_id IN ({placeholders})", tuple(chunk)))
+            if self.viimeisin_virhe:
+                return {}
+        return stats
+
+    def _etsi_tilastot(self, where, ids):
+
+        sql = f"""
+              SELECT p.id, \
+                     p.username, \
+                     SUM(t.games_played) as games_played, \
+                     MAX(t.best_score)   as best_score,
+                     SUM(t.score_total)  as score_total, \
+                     MIN(t.worst_score)  as worst_score
+              FROM players p
+                       LEFT JOIN (SELECT player_id, \
+                                         COUNT(*)   as games_played, \
+                                         MAX(score) as best_score, \
+                                         SUM(score) as score_total, \
+                                         MIN(score) as worst_score \
+                                  FROM high_scores \
+                                  {where} \
+                                  GROUP BY player_id \
+                                  UNION ALL \
+                                  SELECT player_id, games_played, best_score, score_total, worst_score \
+                                  FROM high_score_rollup \
+                                  {where}) t ON t.player_id = p.id
+              {where.replace('player_id', 'p.id')}
+              GROUP BY p.id, p.username \
+              """
+        results = self.suorita_kysely(sql, ids * 3)
+
+        stats = {}
+        for row in results:
+            games_played = int(row[2] or 0)
+            stats[row[0]] = {
+                'username': row[1],
+                'games_played': games_played,
+                'best_score': row[3] or 0,
+                'avg_score': _keskiarvo(row[4], games_played),
+                'worst_score': row[5] or 0
+            }
+        return stats
+
     def get_player_recent_games(self, player_id, limit=5):
 
         sql = "SELECT score, game_mode, played_at FROM high_scores WHERE player_id = %s ORDER BY played_at DESC LIMIT %s"
-        results = self.suorita_kysely(sql, (player_id, limit))
+        results = self.suorita_kysely(sql, (player_id, limit), primary=self.kirjoitettu_askettain(player_id))
 
         games = []
         for row in results:
@@ -214,34 +647,114 @@ class DatabaseManager:
             })
         return games
 
-    # LENTOKENTTÄ- JA MAATIEDOT
+    # KYSYMYSTEN VAIKEUS
+
+    def tallenna_tarkkuudet(self, rows):
+
+        sql = """
+              INSERT INTO item_accuracy (question_type, item_key, correct, incorrect) \
+              VALUES (%s, %s, %s, %s) ON DUPLICATE KEY \
+              UPDATE correct = correct + VALUES(correct), incorrect = incorrect + VALUES(incorrect) \
+              """
+        cursor = self.connection.cursor()
+        try:
+            cursor.executemany(sql, rows)
+            self.connection.commit()
+            return True
+        except mysql.connector.Error:
+            return False
+        finally:
+            cursor.close()
 
-    def etsi_random_lentokentta(self, exclude_ids=None):
-
-        base_sql = """
-                   SELECT a.id, \
-                          a.ident, \
-                          a.type, \
-                          a.name, \
-                          a.latitude_deg, \
-                          a.longitude_deg,
-                          a.elevation_ft, \
-                          a.continent, \
-                          a.iso_country, \
-                          a.municipality, \
-                          c.name as country_name
-                   FROM airport a
-                            LEFT JOIN country c ON a.iso_country = c.iso_country
-                   WHERE a.type IN ('large_airport', 'medium_airport') \
-                   """
-
-        if exclude_ids and len(exclude_ids) > 0:
-            placeholders = ','.join(['%s'] * len(exclude_ids))
-            sql = f"{base_sql} AND a.id NOT IN ({placeholders}) ORDER BY RAND() LIMIT 1"
-            result = self.suorita_kysely(sql, tuple(exclude_ids))
+    def etsi_vaikeimmat_kohteet(self, question_type, limit=10, min_attempts=20):
+
+        if question_type == QuestionType.AIRPORT_ELEVATION:
+            # item_key on merkkijono: muunnetaan se, jotta liitos käyttää game_airport-taulun pääavainta
+            join = "LEFT JOIN game_airport k ON k.id = CAST(i.item_key AS UNSIGNED)"
         else:
-            sql = f"{base_sql} ORDER BY RAND() LIMIT 1"
-            result = self.suorita_kysely(sql)
+            join = "LEFT JOIN game_country k ON k.iso_country = i.item_key"
+
+        sql = f"""
+              SELECT i.item_key, k.name, i.correct, i.incorrect
+              FROM item_accuracy i
+                       {join}
+              WHERE i.question_type = %s \
+                AND i.correct + i.incorrect >= %s
+              ORDER BY i.incorrect / (i.correct + i.incorrect) DESC
+                  LIMIT %s \
+              """
+        results = self.suorita_kysely(sql, (question_type.value, min_attempts, limit))
+
+        items = []
+        for row in results:
+            items.append({
+                'item_key': row[0],
+                'name': row[1] or row[0],
+                'correct': row[2],
+                'incorrect': row[3],
+                'error_rate': round(row[3] / (row[2] + row[3]), 3)
+            })
+        return items
+
+    # KESKENERÄISET PELIT
+
+    def tallenna_checkpoint(self, player_id, data):
+
+        sql = """
+              INSERT INTO game_sessions (player_id, data) \
+              VALUES (%s, %s) ON DUPLICATE KEY \
+              UPDATE data = VALUES(data) \
+              """
+        try:
+            return self.suorita_paivitys(sql, (player_id, data))
+        except mysql.connector.Error:
+            return False
+
+    def hae_checkpoint(self, player_id):
+
+        sql = "SELECT data FROM game_sessions WHERE player_id = %s"
+        result = self.suorita_kysely(sql, (player_id,), primary=True)
+        if result:
+            return bytes(result[0][0])
+        return None
+
+    def poista_checkpoint(self, player_id):
+
+        try:
+            return self.suorita_paivitys("DELETE FROM game_sessions WHERE player_id = %s", (player_id,))
+        except mysql.connector.Error:
+            return False
+
+    # LENTOKENTTÄ- JA MAATIEDOT
+
+    def hae_lentokenttien_idt(self):
+
+        sql = "SELECT id FROM game_airport ORDER BY id"
+        return [row[0] for row in self.suorita_kysely(sql)]
+
+    def hae_maiden_koodit(self):
+
+        sql = "SELECT iso_country FROM game_country ORDER BY iso_country"
+        return [row[0] for row in self.suorita_kysely(sql)]
+
+    def etsi_lentokentta(self, airport_id):
+
+        sql = """
+              SELECT id, \
+                     ident, \
+                     type, \
+                     name, \
+                     latitude_deg, \
+                     longitude_deg,
+                     elevation_ft, \
+                     continent, \
+                     iso_country, \
+                     municipality, \
+                     country_name
+              FROM game_airport
+              WHERE id = %s \
+              """
+        result = self.suorita_kysely(sql, (airport_id,))
 
         if result:
             row = result[0]
@@ -253,21 +766,14 @@ class DatabaseManager:
             }
         return None
 
-    def etsi_random_maa(self, exclude_codes=None):
+    def etsi_maa(self, iso_country):
 
-        base_sql = """
-                   SELECT iso_country, name, continent, population, wikipedia_link, keywords
-                   FROM country \
-                   WHERE population IS NOT NULL \
-                   """
-
-        if exclude_codes and len(exclude_codes) > 0:
-            placeholders = ','.join(['%s'] * len(exclude_codes))
-            sql = f"{base_sql} AND iso_country NOT IN ({placeholders}) ORDER BY RAND() LIMIT 1"
-            result = self.suorita_kysely(sql, tuple(exclude_codes))
-        else:
-            sql = f"{base_sql} ORDER BY RAND() LIMIT 1"
-            result = self.suorita_kysely(sql)
+        sql = """
+              SELECT iso_country, name, continent, population, wikipedia_link, keywords
+              FROM game_country \
+              WHERE iso_country = %s \
+              """
+        result = self.suorita_kysely(sql, (iso_country,))
 
         if result:
             row = result[0]
@@ -279,21 +785,282 @@ class DatabaseManager:
 
 
 
+# MITTAUS
+
+
+class _NullSpan:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.tracer.child_time.append(0.0)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        child_time = self.tracer.child_time.pop()
+        if self.tracer.child_time:
+            self.tracer.child_time[-1] += elapsed
+        self.tracer.kirjaa(self.name, elapsed, elapsed - child_time)
+        return False
+
+
+class Tracer:
+    """Vaihekohtaiset ajastukset; pois päältä span() palauttaa jaetun tyhjän kontekstin"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        # avoimien vaiheiden alivaiheisiin kulunut aika, jotta sisäkkäiset vaiheet eivät laske samaa aikaa kahdesti
+        self.child_time = []
+
+    def span(self, name):
+
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def kirjaa(self, name, elapsed, self_time=None):
+
+        if self_time is None:
+            self_time = elapsed
+
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [1, self_time, elapsed, elapsed]
+        else:
+            phase[0] += 1
+            phase[1] += self_time
+            phase[2] += elapsed
+            if elapsed > phase[3]:
+                phase[3] = elapsed
+
+    def yhteenveto(self):
+
+        lines = [f"{'Vaihe':24} {'Kutsuja':>8} {'Oma ms':>10} {'Ka. ms':>8} {'Sis. ms':>10} {'Max ms':>8}"]
+        for name, (count, own, total, longest) in sorted(self.phases.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:24} {count:8} {own * 1000:10.2f} {own * 1000 / count:8.3f} "
+                         f"{total * 1000:10.2f} {longest * 1000:8.3f}")
+        lines.append("Oma = ilman alivaiheita (summautuu kokonaisajaksi), Sis. ja Max = alivaiheet mukaan lukien")
+        return "\n".join(lines)
+
+
+
 # PELILOGIIKKA
 
 
+_VAPAA_TAVU = re.compile(rb'[^\xff]')
+
+
+class ExclusionSet:
+    """Bittikartta käytetyistä kohteista, indeksinä kohteen tiivis järjestysnumero"""
+
+    def __init__(self, size):
+        self.size = size
+        self.bits = bytearray((size + 7) // 8)
+        self.count = 0
+        self.clear()
+
+    def clear(self):
+
+        self.bits[:] = bytes(len(self.bits))
+        self.count = 0
+
+        # viimeisen tavun ylimääräiset bitit merkitään varatuiksi, jotta find_free ei palauta niitä
+        if self.size & 7:
+            self.bits[-1] = (0xFF << (self.size & 7)) & 0xFF
+
+    def __contains__(self, index):
+
+        return (self.bits[index >> 3] & (1 << (index & 7))) != 0
+
+    def add(self, index):
+
+        mask = 1 << (index & 7)
+        if not self.bits[index >> 3] & mask:
+            self.bits[index >> 3] |= mask
+            self.count += 1
+
+    def is_full(self):
+
+        return self.count >= self.size
+
+    def find_free(self, start=0):
+
+        match = _VAPAA_TAVU.search(self.bits, start >> 3) or _VAPAA_TAVU.search(self.bits)
+        if not match:
+            return None
+
+        byte_index = match.start()
+        byte = self.bits[byte_index]
+        return byte_index * 8 + (~byte & (byte + 1)).bit_length() - 1
+
+
+class ItemPool:
+    """Kysymyspakka: arpoo kohteet ilman toistoja ja sekoittaa pakan uudelleen, kun se loppuu"""
+
+    PROBE_LIMIT = 16
+    RECENT_LIMIT = 2
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.used = ExclusionSet(len(self.keys))
+        self.recent = []
+
+    def reset(self):
+
+        self.used.clear()
+        self.recent = []
+
+    def recycle(self):
+
+        # juuri näytetyt kohteet pysyvät poissa uudeltakin kierrokselta, ettei sama tule heti uudelleen;
+        # pienessä pakassa suljetaan pois niin monta viimeisintä kuin voidaan jättäen yksi vapaaksi
+        self.used.clear()
+        keep = len(self.keys) - 1
+        if keep > 0:
+            for index in self.recent[-keep:]:
+                self.used.add(index)
+
+    def draw(self):
+
+        size = len(self.keys)
+        if size == 0:
+            return None
+
+        if self.used.is_full():
+            self.recycle()
+
+        for _ in range(self.PROBE_LIMIT):
+            index = random.randrange(size)
+            if index not in self.used:
+                break
+        else:
+            index = self.used.find_free(random.randrange(size))
+
+        self.used.add(index)
+        self.recent = (self.recent + [index])[-self.RECENT_LIMIT:]
+        return self.keys[index]
+
+    def pack(self):
+
+        header = struct.pack(f'<III{len(self.recent)}I', len(self.keys), self.used.count, len(self.recent), *self.recent)
+        return header + bytes(self.used.bits)
+
+    def unpack(self, data, offset=0):
+
+        size, count, recent_count = struct.unpack_from('<III', data, offset)
+        offset += 12
+        recent = list(struct.unpack_from(f'<{recent_count}I', data, offset))
+        offset += 4 * recent_count
+        bits_end = offset + (size + 7) // 8
+
+        # kohdejoukko on vaihtunut tallennuksen jälkeen (esim. aineiston päivitys) tai tallenne on katkennut:
+        # aloitetaan puhtaalta pöydältä
+        if size != len(self.keys) or len(data) < bits_end or any(index >= size for index in recent):
+            self.reset()
+            return bits_end
+
+        self.used.bits[:] = data[offset:bits_end]
+        self.used.count = count
+        self.recent = recent
+        return bits_end
+
+
+class ItemAccuracyCounters:
+    """Kohdekohtaiset oikein/väärin-laskurit muistissa; kirjoitetaan kantaan erissä"""
+
+    FLUSH_INTERVAL = 60.0
+
+    def __init__(self):
+        self.correct = Counter()
+        self.incorrect = Counter()
+        self.next_flush = time.monotonic() + self.FLUSH_INTERVAL
+
+    def kirjaa(self, question_type, key, correct):
+
+        (self.correct if correct else self.incorrect)[(question_type, key)] += 1
+
+    def tyhjenna_tarvittaessa(self, db):
+
+        if time.monotonic() >= self.next_flush:
+            self.tyhjenna(db)
+
+    def tyhjenna(self, db):
+
+        self.next_flush = time.monotonic() + self.FLUSH_INTERVAL
+        keys = self.correct.keys() | self.incorrect.keys()
+        if not keys:
+            return True
+
+        rows = [
+            (question_type.value, str(key), self.correct[(question_type, key)], self.incorrect[(question_type, key)])
+            for question_type, key in keys
+        ]
+        if not db.tallenna_tarkkuudet(rows):
+            return False
+
+        self.correct.clear()
+        self.incorrect.clear()
+        return True
+
+
+def _pack_key(key):
+
+    if key is None:
+        return b'\x00'
+    if isinstance(key, int):
+        return b'\x01' + struct.pack('<q', key)
+    encoded = key.encode('utf-8')
+    return b'\x02' + struct.pack('<B', len(encoded)) + encoded
+
+
+def _unpack_key(data, offset):
+
+    tag = data[offset]
+    if tag == 0:
+        return None, offset + 1
+    if tag == 1:
+        return struct.unpack_from('<q', data, offset + 1)[0], offset + 9
+    length = data[offset + 1]
+    return bytes(data[offset + 2:offset + 2 + length]).decode('utf-8'), offset + 2 + length
+
+
 class GameEngine:
 
 
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, tracer=None):
         self.db = db_manager
+        self.tracer = tracer or Tracer()
         self.settings = GameSettings()
         self.state = GameState()
-        self.used_ids = []
-        self.used_country_codes = []
+        self.item_pools = {}
+        self.checkpoints_enabled = False
+        self.tarkkuus = ItemAccuracyCounters()
 
     def aloita_uusi_peli(self, player_id, username, question_type, game_mode=GameMode.CLASSIC):
 
+        self.tarkkuus.tyhjenna_tarvittaessa(self.db)
         high_score = self.db.etsi_pelaajan_highscore(player_id, game_mode.value)
 
         self.state = GameState()
@@ -306,14 +1073,15 @@ class GameEngine:
         self.state.time_remaining = self.get_initial_time(game_mode)
         self.state.start_time = time.time() if game_mode == GameMode.TIME_ATTACK else 0
 
-        self.used_ids = []
-        self.used_country_codes = []
+        for pool in self.item_pools.values():
+            pool.reset()
         self.state.current_item = self.get_next_item()
         self.state.next_item = self.get_next_item()
+        self.tallenna_checkpoint()
 
     def get_initial_lives(self, game_mode):
 
-        if game_mode == GameMode.CLASSIC:
+        if game_mode in (GameMode.CLASSIC, GameMode.RACE):
             return self.settings.LIVES_CLASSIC
         return self.settings.LIVES_OTHER
 
@@ -323,17 +1091,90 @@ class GameEngine:
             return self.settings.TIME_ATTACK_DURATION
         return 0.0
 
+    def get_item_pool(self):
+
+        pool = self.item_pools.get(self.state.question_type)
+        if pool is None:
+            if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
+                keys = self.db.hae_lentokenttien_idt()
+            else:
+                keys = self.db.hae_maiden_koodit()
+
+            pool = ItemPool(keys)
+            if keys:
+                self.item_pools[self.state.question_type] = pool
+        return pool
+
     def get_next_item(self):
 
+        with self.tracer.span('get_next_item'):
+            key = self.get_item_pool().draw()
+            if key is None:
+                return None
+
+            item = self.hae_kohde(key)
+            if item is None:
+                # aineisto on päivitetty pelin aikana: ladataan kohdejoukko uudelleen
+                self.item_pools.pop(self.state.question_type, None)
+                key = self.get_item_pool().draw()
+                item = self.hae_kohde(key) if key is not None else None
+            return item
+
+    def hae_kohde(self, key):
+
         if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
-            item = self.db.etsi_random_lentokentta(self.used_ids)
-            if item:
-                self.used_ids.append(item['id'])
-        else:
-            item = self.db.etsi_random_maa(self.used_country_codes)
-            if item:
-                self.used_country_codes.append(item['iso_country'])
-        return item
+            return self.db.etsi_lentokentta(key)
+        return self.db.etsi_maa(key)
+
+    def item_key(self, item):
+
+        if not item:
+            return None
+        if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
+            return item['id']
+        return item['iso_country']
+
+    def luo_checkpoint(self):
+
+        return b''.join([
+            self.state.pack(),
+            _pack_key(self.item_key(self.state.current_item)),
+            _pack_key(self.item_key(self.state.next_item)),
+            self.get_item_pool().pack()
+        ])
+
+    def palauta_checkpoint(self, data):
+
+        try:
+            state, offset = GameState.unpack(data)
+            current_key, offset = _unpack_key(data, offset)
+            next_key, offset = _unpack_key(data, offset)
+        except (struct.error, ValueError, IndexError):
+            return False
+
+        self.state = state
+        pool = self.get_item_pool()
+        try:
+            pool.unpack(data, offset)
+        except struct.error:
+            pool.reset()
+
+        self.state.current_item = self.hae_kohde(current_key)
+        self.state.next_item = self.hae_kohde(next_key)
+
+        if self.state.game_mode == GameMode.TIME_ATTACK:
+            # aikaraja jatkuu siitä, mihin se tallennushetkellä jäi
+            self.state.start_time = time.time() - (self.settings.TIME_ATTACK_DURATION - self.state.time_remaining)
+        return True
+
+    def tallenna_checkpoint(self):
+
+        # jokainen arvaus muuttaa pisteitä tai elämiä, joten tilanne tallennetaan joka arvauksen jälkeen:
+        # harvennettuna keskeytys heti väärän arvauksen jälkeen palauttaisi menetetyn elämän.
+        # Tallenne on noin sata tavua ja yksi upsert pelaajan riville.
+        if self.checkpoints_enabled and self.state.player_id and not self.state.game_over:
+            with self.tracer.span('checkpoint'):
+                self.db.tallenna_checkpoint(self.state.player_id, self.luo_checkpoint())
 
     def get_value(self, item):
 
@@ -366,29 +1207,37 @@ class GameEngine:
         self.state.game_over = True
         if self.state.player_id:
             self.db.tallenna_score(self.state.player_id, self.state.score, self.state.game_mode.value)
+            if self.checkpoints_enabled:
+                self.db.poista_checkpoint(self.state.player_id)
+        self.tarkkuus.tyhjenna_tarvittaessa(self.db)
 
     def arvaus(self, is_higher):
 
-        if self.state.game_over:
-            return False, "Peli on päättynyt!"
+        with self.tracer.span('arvaus'):
+            if self.state.game_over:
+                return False, "Peli on päättynyt!"
 
 
-        if self.state.game_mode == GameMode.TIME_ATTACK and self.paivita_aika():
-            return False, "Aika loppui!"
+            if self.state.game_mode == GameMode.TIME_ATTACK and self.paivita_aika():
+                return False, "Aika loppui!"
 
-        current_value = self.get_value(self.state.current_item)
-        next_value = self.get_value(self.state.next_item)
-        correct = self.is_guess_correct(is_higher, current_value, next_value)
+            current_value = self.get_value(self.state.current_item)
+            next_value = self.get_value(self.state.next_item)
+            correct = self.is_guess_correct(is_higher, current_value, next_value)
+            self.tarkkuus.kirjaa(self.state.question_type, self.item_key(self.state.next_item), correct)
 
 
-        if self.state.first_guess:
-            self.state.first_guess = False
-            self.state.show_current_value = True
+            if self.state.first_guess:
+                self.state.first_guess = False
+                self.state.show_current_value = True
 
-        if correct:
-            return self.handle_correct_guess()
-        else:
-            return self.handle_incorrect_guess()
+            if correct:
+                result = self.handle_correct_guess()
+            else:
+                result = self.handle_incorrect_guess()
+
+            self.tallenna_checkpoint()
+            return result
 
     def is_guess_correct(self, is_higher, current, next_val):
 
@@ -444,52 +1293,177 @@ class GameEngine:
 
     def format_item_name(self, item):
 
-        if not item:
-            return "Tuntematon"
+        with self.tracer.span('format'):
+            if not item:
+                return "Tuntematon"
 
-        if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
-            name = item.get('name', 'Tuntematon')
-            country = item.get('country_name', '')
-            municipality = item.get('municipality', '')
-
-            if municipality and country:
-                return f"{name} ({municipality}, {country})"
-            elif country:
-                return f"{name} ({country})"
-            return name
-        else:
-            return item.get('name', 'Tuntematon')
+            if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
+                name = item.get('name', 'Tuntematon')
+                country = item.get('country_name', '')
+                municipality = item.get('municipality', '')
+
+                if municipality and country:
+                    return f"{name} ({municipality}, {country})"
+                elif country:
+                    return f"{name} ({country})"
+                return name
+            else:
+                return item.get('name', 'Tuntematon')
 
     def format_value(self, value):
 
-        if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
-            return f"Korkeus: {int(value):,} ft".replace(',', ' ')
-        else:
-            return f"Väkiluku: {int(value):,}".replace(',', ' ')
+        with self.tracer.span('format'):
+            if self.state.question_type == QuestionType.AIRPORT_ELEVATION:
+                return f"Korkeus: {int(value):,} ft".replace(',', ' ')
+            else:
+                return f"Väkiluku: {int(value):,}".replace(',', ' ')
 
     def get_current_display(self):
 
-        if self.state.game_mode == GameMode.TIME_ATTACK:
-            self.paivita_aika()
-
-        current_value = int(self.get_value(self.state.current_item))
-
-        return {
-            'score': self.state.score,
-            'lives': self.state.lives,
-            'current_item': self.format_item_name(self.state.current_item),
-            'current_value': current_value,
-            'current_value_formatted': self.format_value(current_value),
-            'next_item': self.format_item_name(self.state.next_item),
-            'question_type': "Lentokentän korkeus" if self.state.question_type == QuestionType.AIRPORT_ELEVATION else "Maan väkiluku",
-            'game_over': self.state.game_over,
-            'high_score': self.state.high_score,
-            'player_username': self.state.player_username,
-            'show_current_value': self.state.show_current_value,
-            'first_guess': self.state.first_guess,
-            'game_mode': self.state.game_mode,
-            'time_remaining': self.state.time_remaining
-        }
+        with self.tracer.span('get_current_display'):
+            if self.state.game_mode == GameMode.TIME_ATTACK:
+                self.paivita_aika()
+
+            current_value = int(self.get_value(self.state.current_item))
+
+            return {
+                'score': self.state.score,
+                'lives': self.state.lives,
+                'current_item': self.format_item_name(self.state.current_item),
+                'current_value': current_value,
+                'current_value_formatted': self.format_value(current_value),
+                'next_item': self.format_item_name(self.state.next_item),
+                'question_type': "Lentokentän korkeus" if self.state.question_type == QuestionType.AIRPORT_ELEVATION else "Maan väkiluku",
+                'game_over': self.state.game_over,
+                'high_score': self.state.high_score,
+                'player_username': self.state.player_username,
+                'show_current_value': self.state.show_current_value,
+                'first_guess': self.state.first_guess,
+                'game_mode': self.state.game_mode,
+                'time_remaining': self.state.time_remaining
+            }
+
+
+
+# KILPAILU
+
+
+class RaceRoom:
+    """Paikallinen kilpailu samalla koneella kierroksittain: kohdejono arvotaan kerran ja kaikki etenevät samassa järjestyksessä"""
+
+    def __init__(self, db, question_type, tracer=None):
+        self.db = db
+        self.question_type = question_type
+        self.tracer = tracer or Tracer()
+        self.participants = []
+        self.items = []
+        self.kierros = 0
+        self.lock = threading.Lock()
+
+        # tavallinen moottori toimii jonon lähteenä, joten kohdepakka ja sen kierrätys ovat samat kuin yksinpelissä
+        self.source = GameEngine(db, self.tracer)
+        self.source.state.question_type = question_type
+
+    def liity(self, player_id, username):
+
+        engine = RaceEngine(self.db, self, self.tracer)
+        engine.aloita_uusi_peli(player_id, username, self.question_type, GameMode.RACE)
+        with self.lock:
+            self.participants.append(engine)
+        return engine
+
+    def kohde(self, position):
+
+        with self.lock:
+            while len(self.items) <= position:
+                item = self.source.get_next_item()
+                if item is None:
+                    return None
+                self.items.append(item)
+            return self.items[position]
+
+    def tilanne(self):
+
+        with self.lock:
+            participants = list(self.participants)
+
+        ranked = sorted(participants, key=lambda engine: (-engine.state.score, engine.finished_round or float('inf')))
+        return [
+            {
+                'username': engine.state.player_username,
+                'score': engine.state.score,
+                'lives': engine.state.lives,
+                'finished': engine.finished_round is not None,
+                'game_over': engine.state.game_over
+            }
+            for engine in ranked
+        ]
+
+    def mukana(self):
+
+        with self.lock:
+            return [engine for engine in self.participants if not engine.state.game_over]
+
+    def pelaa_kierros(self, choices):
+        """Ratkaisee kierroksen arvaukset (moottori, is_higher) vasta kun kaikki ovat vastanneet.
+
+        Elossa olevat pelaajat ovat aina samassa kohdassa jonoa, joten yhdenkin tuloksen näyttäminen
+        ennen muiden vastauksia paljastaisi seuraavan arvattavan kohteen arvon.
+        """
+
+        self.kierros += 1
+        results = []
+        for engine, is_higher in choices:
+            correct, message = engine.arvaus(is_higher)
+            results.append((engine, correct, message))
+
+        if any(engine.finished_round is not None for engine in self.participants):
+            self.lopeta_kaikki()
+        return results
+
+    def lopeta_kaikki(self):
+
+        # maaliin pääsy päättää kilpailun kierroksen lopussa: muiden pisteet tallennetaan sellaisinaan
+        for engine in self.mukana():
+            engine.lopeta_peli()
+
+    def on_paattynyt(self):
+
+        with self.lock:
+            return all(engine.state.game_over for engine in self.participants)
+
+
+class RaceEngine(GameEngine):
+
+    def __init__(self, db_manager, room, tracer=None):
+        super().__init__(db_manager, tracer)
+        self.room = room
+        # huoneen osallistujat kirjaavat arvaukset yhteisiin laskureihin, jotka kirjoitetaan kantaan kerralla
+        self.tarkkuus = room.source.tarkkuus
+        self.position = 0
+        self.finished_round = None
+
+    def aloita_uusi_peli(self, player_id, username, question_type, game_mode=GameMode.RACE):
+
+        self.position = 0
+        self.finished_round = None
+        super().aloita_uusi_peli(player_id, username, question_type, game_mode)
+
+    def get_next_item(self):
+
+        with self.tracer.span('get_next_item'):
+            item = self.room.kohde(self.position)
+            self.position += 1
+            return item
+
+    def handle_correct_guess(self):
+
+        correct, message = super().handle_correct_guess()
+        if self.state.score >= self.settings.RACE_TARGET:
+            self.finished_round = self.room.kierros
+            self.lopeta_peli()
+            message += f"\n\nMAALISSA! {self.state.score} pistettä"
+        return correct, message
 
 
 
@@ -522,13 +1496,14 @@ class MenuRenderer:
         print("1. Klassinen - 3 elämää")
         print("2. Äkkikuolema - 1 elämä, yksi virhe päättää pelin")
         print("3. Aikaraja - 1 elämä, 60 sekuntia, nopeatempoinen")
-        print("4. Takaisin päävalikkoon")
+        print("4. Kilpailu - 2 tai useampi pelaaja vuorotellen samalla koneella")
+        print("5. Takaisin päävalikkoon")
 
         while True:
-            choice = input("\nValitse (1-4): ")
-            if choice in ['1', '2', '3', '4']:
+            choice = input("\nValitse (1-5): ")
+            if choice in ['1', '2', '3', '4', '5']:
                 return choice
-            print("Virheellinen valinta! Valitse 1, 2, 3 tai 4.")
+            print("Virheellinen valinta! Valitse 1, 2, 3, 4 tai 5.")
 
     def nayta_kysymystyyppivalikko(self):
 
@@ -551,7 +1526,9 @@ class MenuRenderer:
         print("1. Klassinen")
         print("2. Äkkikuolema")
         print("3. Aikaraja")
-        return input("\nValitse (1-3) tai Enter palataksesi: ")
+        print("4. Kilpailu")
+        print("5. Etsi pelaaja")
+        return input("\nValitse (1-5) tai Enter palataksesi: ")
 
 
 class GameDisplay:
@@ -565,11 +1542,12 @@ class GameDisplay:
         mode_descriptions = {
             'classic': 'Klassinen',
             'sudden_death': 'Äkkikuolema',
-            'time_attack': 'Aikaraja'
+            'time_attack': 'Aikaraja',
+            'race': 'Kilpailu'
         }
         mode_name = mode_descriptions.get(display_info['game_mode'].value, 'Tuntematon')
 
-        if display_info['game_mode'].value == 'classic':
+        if display_info['game_mode'].value in ('classic', 'race'):
             lives_display = '❤️ ' * display_info['lives']
         elif display_info['game_mode'].value == 'sudden_death':
             lives_display = '💀'
@@ -644,7 +1622,8 @@ class StatisticsRenderer:
         mode_names = {
             'classic': 'Klassinen',
             'sudden_death': 'Äkkikuolema',
-            'time_attack': 'Aikaraja'
+            'time_attack': 'Aikaraja',
+            'race': 'Kilpailu'
         }
         return mode_names.get(game_mode, game_mode)
 
@@ -653,7 +1632,8 @@ class StatisticsRenderer:
         mode_names = {
             'classic': 'Klassinen',
             'sudden_death': 'Äkkikuolema',
-            'time_attack': 'Aikaraja'
+            'time_attack': 'Aikaraja',
+            'race': 'Kilpailu'
         }
         mode_name = mode_names.get(game_mode, game_mode)
 
@@ -674,15 +1654,901 @@ class StatisticsRenderer:
 
 
 
+# AINEISTON TUONTI
+
+
+class DatasetImporter:
+    """Rakentaa pelin omat game_airport- ja game_country-taulut ja vaihtaa ne käyttöön kerralla.
+
+    Lähdetaulut (airport, country) jäävät koskemattomiksi; peli lukee vain omia suodatettuja taulujaan.
+    """
+
+    BATCH_SIZE = 5000
+    AIRPORT_TYPES = ('large_airport', 'medium_airport')
+
+    AIRPORT_TABLE = """
+        CREATE TABLE game_airport_import
+        (
+            id            INT PRIMARY KEY,
+            ident         VARCHAR(40)  NOT NULL,
+            type          VARCHAR(40)  NOT NULL,
+            name          VARCHAR(200) NOT NULL,
+            latitude_deg  DOUBLE,
+            longitude_deg DOUBLE,
+            elevation_ft  INT          NOT NULL,
+            continent     VARCHAR(40),
+            iso_country   VARCHAR(40),
+            municipality  VARCHAR(100),
+            country_name  VARCHAR(100)
+        )
+        """
+
+    COUNTRY_TABLE = """
+        CREATE TABLE game_country_import
+        (
+            iso_country    VARCHAR(40) PRIMARY KEY,
+            name           VARCHAR(100) NOT NULL,
+            continent      VARCHAR(40),
+            population     BIGINT       NOT NULL,
+            wikipedia_link VARCHAR(200),
+            keywords       VARCHAR(200)
+        )
+        """
+
+    AIRPORT_INSERT = """
+        INSERT INTO game_airport_import (id, ident, type, name, latitude_deg, longitude_deg,
+                                         elevation_ft, continent, iso_country, municipality, country_name)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+
+    COUNTRY_INSERT = """
+        INSERT INTO game_country_import (iso_country, name, continent, population, wikipedia_link, keywords)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+
+    AIRPORT_FROM_SOURCE = """
+        INSERT INTO game_airport_import (id, ident, type, name, latitude_deg, longitude_deg,
+                                         elevation_ft, continent, iso_country, municipality, country_name)
+        SELECT a.id, a.ident, a.type, a.name, a.latitude_deg, a.longitude_deg,
+               a.elevation_ft, a.continent, a.iso_country, a.municipality, c.name
+        FROM airport a
+                 LEFT JOIN country c ON a.iso_country = c.iso_country
+        WHERE a.type IN ('large_airport', 'medium_airport')
+          AND a.elevation_ft IS NOT NULL
+        """
+
+    COUNTRY_FROM_SOURCE = """
+        INSERT INTO game_country_import (iso_country, name, continent, population, wikipedia_link, keywords)
+        SELECT iso_country, name, continent, population, wikipedia_link, keywords
+        FROM country
+        WHERE population IS NOT NULL
+        """
+
+    def __init__(self, db):
+        self.db = db
+
+    def tuo(self, airports_path, countries_path):
+
+        country_names = self.lue_maiden_nimet(countries_path)
+
+        def fill(cursor):
+            airports = self.lataa_erissa(cursor, self.AIRPORT_INSERT, self.lue_lentokentat(airports_path, country_names))
+            countries = self.lataa_erissa(cursor, self.COUNTRY_INSERT, self.lue_maat(countries_path))
+            return airports, countries
+
+        return self.rakenna(fill)
+
+    def rakenna_lahdetauluista(self):
+
+        def fill(cursor):
+            cursor.execute(self.AIRPORT_FROM_SOURCE)
+            airports = cursor.rowcount
+            cursor.execute(self.COUNTRY_FROM_SOURCE)
+            return airports, cursor.rowcount
+
+        return self.rakenna(fill)
+
+    def rakenna(self, fill):
+
+        connection = self.db.connection
+        cursor = connection.cursor()
+        try:
+            cursor.execute("DROP TABLE IF EXISTS game_airport_import, game_country_import")
+            cursor.execute(self.AIRPORT_TABLE)
+            cursor.execute(self.COUNTRY_TABLE)
+
+            counts = fill(cursor)
+            connection.commit()
+
+            self.vaihda_taulut(cursor)
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        return counts
+
+    def lataa_erissa(self, cursor, sql, rows):
+
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+        return count
+
+    def vaihda_taulut(self, cursor):
+
+        renames = []
+        for table in ('game_airport', 'game_country'):
+            if self.taulu_olemassa(cursor, table):
+                renames.append(f"{table} TO {table}_old")
+            renames.append(f"{table}_import TO {table}")
+
+        cursor.execute("DROP TABLE IF EXISTS game_airport_old, game_country_old")
+        # yksi RENAME TABLE on atominen: käynnissä olevat pelit näkevät joko vanhan tai uuden aineiston
+        cursor.execute("RENAME TABLE " + ", ".join(renames))
+        cursor.execute("DROP TABLE IF EXISTS game_airport_old, game_country_old")
+
+    def taulu_olemassa(self, cursor, table):
+
+        cursor.execute("SHOW TABLES LIKE %s", (table,))
+        return bool(cursor.fetchall())
+
+    def lue_lentokentat(self, path, country_names):
+
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            for row in csv.DictReader(file):
+                if row.get('type') not in self.AIRPORT_TYPES:
+                    continue
+
+                elevation = _parse_int(row.get('elevation_ft'))
+                airport_id = _parse_int(row.get('id'))
+                if elevation is None or airport_id is None:
+                    continue
+
+                iso_country = row.get('iso_country') or None
+                yield (
+                    airport_id, row['ident'], row['type'], row['name'],
+                    _parse_float(row.get('latitude_deg')), _parse_float(row.get('longitude_deg')),
+                    elevation, row.get('continent') or None, iso_country,
+                    row.get('municipality') or None, country_names.get(iso_country)
+                )
+
+    def lue_maiden_nimet(self, path):
+
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            return {
+                row.get('iso_country') or row.get('code'): row['name']
+                for row in csv.DictReader(file)
+            }
+
+    def lue_maat(self, path):
+
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            reader = csv.DictReader(file)
+            if 'population' not in (reader.fieldnames or []):
+                raise ValueError(f"Tiedostosta {path} puuttuu population-sarake")
+
+            for row in reader:
+                code = row.get('iso_country') or row.get('code')
+                population = _parse_int(row.get('population'))
+                if not code or population is None:
+                    continue
+
+                yield (
+                    code, row['name'], row.get('continent') or None, population,
+                    row.get('wikipedia_link') or None, row.get('keywords') or None
+                )
+
+
+def _parse_int(value):
+
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_float(value):
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def tuo_aineisto(db, airports_path, countries_path):
+
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+
+    start = time.perf_counter()
+    try:
+        airports, countries = DatasetImporter(db).tuo(airports_path, countries_path)
+    finally:
+        db.close()
+
+    print(f"Tuotu {airports} lentokenttää ja {countries} maata ({time.perf_counter() - start:.1f} s)")
+
+
+
+# PISTETAULUN YLLÄPITO
+
+
+def _kuukauden_alku(year, month):
+
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+class HighScoreMaintenance:
+    """Osioi high_scores-taulun kuukausittain ja pelimuodoittain sekä kokoaa säilytysajan ylittäneet rivit"""
+
+    HALL_OF_FAME_SIZE = 100
+
+    def __init__(self, db, retention_months=6):
+        self.db = db
+        self.retention_months = retention_months
+
+    def aja(self, partition=False):
+
+        cutoff = self.katkaisupaiva()
+        if partition and not self.on_osioitu():
+            self.osioi()
+        if self.on_osioitu():
+            self.lisaa_tulevat_osiot()
+
+        rolled_up = self.kokoa_vanhat(cutoff)
+
+        dropped = []
+        if self.on_osioitu():
+            dropped = self.poista_vanhat_osiot(cutoff)
+        return rolled_up, dropped
+
+    def katkaisupaiva(self):
+
+        today = date.today()
+        return _kuukauden_alku(today.year, today.month - self.retention_months)
+
+    def kokoa_vanhat(self, cutoff):
+
+        connection = self.db.connection
+        cursor = connection.cursor()
+        try:
+            # vanhojen rivien joukosta parhaat säilyvät yksittäisinä riveinä, jotta etsi_top_scoret pysyy tarkkana
+            for mode in GameMode:
+                cursor.execute("""
+                    INSERT IGNORE INTO high_score_hall_of_fame (id, player_id, score, game_mode, played_at)
+                    SELECT id, player_id, score, game_mode, played_at
+                    FROM high_scores
+                    WHERE game_mode = %s AND played_at < %s
+                    ORDER BY score DESC
+                    LIMIT %s
+                    """, (mode.value, cutoff, self.HALL_OF_FAME_SIZE))
+
+                cursor.execute("""
+                    SELECT score FROM high_score_hall_of_fame
+                    WHERE game_mode = %s
+                    ORDER BY score DESC
+                    LIMIT 1 OFFSET %s
+                    """, (mode.value, self.HALL_OF_FAME_SIZE - 1))
+                row = cursor.fetchone()
+                if row:
+                    cursor.execute("DELETE FROM high_score_hall_of_fame WHERE game_mode = %s AND score < %s",
+                                   (mode.value, row[0]))
+
+            cursor.execute("""
+                INSERT INTO high_score_rollup (player_id, game_mode, games_played, score_total, best_score, worst_score)
+                SELECT player_id, game_mode, COUNT(*), SUM(score), MAX(score), MIN(score)
+                FROM high_scores
+                WHERE played_at < %s
+                GROUP BY player_id, game_mode
+                ON DUPLICATE KEY UPDATE games_played = games_played + VALUES(games_played),
+                                        score_total  = score_total + VALUES(score_total),
+                                        best_score   = GREATEST(best_score, VALUES(best_score)),
+                                        worst_score  = LEAST(worst_score, VALUES(worst_score))
+                """, (cutoff,))
+
+            cursor.execute("DELETE FROM high_scores WHERE played_at < %s", (cutoff,))
+            rolled_up = cursor.rowcount
+
+            # kooste ja poisto samassa transaktiossa: kyselyt näkevät jokaisen pelin täsmälleen kerran
+            connection.commit()
+            return rolled_up
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # OSIOINTI
+
+    def on_osioitu(self):
+
+        return bool(self.osiot())
+
+    def osiot(self):
+
+        sql = """
+              SELECT DISTINCT PARTITION_NAME
+              FROM information_schema.PARTITIONS
+              WHERE TABLE_SCHEMA = DATABASE() \
+                AND TABLE_NAME = 'high_scores' \
+                AND PARTITION_NAME IS NOT NULL \
+              """
+        return [row[0] for row in self.db.suorita_kysely(sql, primary=True)]
+
+    def osio_raja(self, month_start):
+
+        # TIMESTAMP-sarakkeen osiointi sallii vain UNIX_TIMESTAMP()-funktion, DATETIME-sarakkeen TO_DAYS()
+        if self.aikasarakkeen_tyyppi() == 'timestamp':
+            return f"UNIX_TIMESTAMP('{month_start.isoformat()} 00:00:00')"
+        return f"TO_DAYS('{month_start.isoformat()}')"
+
+    def aikasarakkeen_tyyppi(self):
+
+        sql = """
+              SELECT DATA_TYPE
+              FROM information_schema.COLUMNS
+              WHERE TABLE_SCHEMA = DATABASE() \
+                AND TABLE_NAME = 'high_scores' \
+                AND COLUMN_NAME = 'played_at' \
+              """
+        result = self.db.suorita_kysely(sql, primary=True)
+        return result[0][0].lower() if result else 'timestamp'
+
+    def osion_maaritys(self, month_start):
+
+        next_month = _kuukauden_alku(month_start.year, month_start.month + 1)
+        return f"PARTITION p{month_start:%Y%m} VALUES LESS THAN ({self.osio_raja(next_month)})"
+
+    def osioi(self):
+
+        # osioitu InnoDB-taulu ei tue viiteavaimia, ja jokaisen yksilöivän avaimen on sisällettävä osiointisarakkeet
+        sql = """
+              SELECT CONSTRAINT_NAME
+              FROM information_schema.REFERENTIAL_CONSTRAINTS
+              WHERE CONSTRAINT_SCHEMA = DATABASE() \
+                AND TABLE_NAME = 'high_scores' \
+              """
+        for (constraint,) in self.db.suorita_kysely(sql, primary=True):
+            print(f"Poistetaan viiteavain {constraint} osioinnin tieltä")
+            self.db.suorita_paivitys(f"ALTER TABLE high_scores DROP FOREIGN KEY `{constraint}`")
+
+        self.db.suorita_paivitys("ALTER TABLE high_scores DROP PRIMARY KEY, ADD PRIMARY KEY (id, played_at, game_mode)")
+
+        result = self.db.suorita_kysely("SELECT MIN(played_at) FROM high_scores", primary=True)
+        oldest = result[0][0] if result and result[0][0] else datetime.now()
+        today = date.today()
+
+        partitions = []
+        month = _kuukauden_alku(oldest.year, oldest.month)
+        last = _kuukauden_alku(today.year, today.month + 1)
+        while month <= last:
+            partitions.append(self.osion_maaritys(month))
+            month = _kuukauden_alku(month.year, month.month + 1)
+        partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+        column = "UNIX_TIMESTAMP(played_at)" if self.aikasarakkeen_tyyppi() == 'timestamp' else "TO_DAYS(played_at)"
+        self.db.suorita_paivitys(
+            f"ALTER TABLE high_scores PARTITION BY RANGE ({column}) "
+            f"SUBPARTITION BY KEY (game_mode) SUBPARTITIONS {len(GameMode)} "
+            f"({', '.join(partitions)})"
+        )
+
+    def lisaa_tulevat_osiot(self):
+
+        existing = set(self.osiot())
+        today = date.today()
+        missing = []
+        for offset in (0, 1):
+            month = _kuukauden_alku(today.year, today.month + offset)
+            if f"p{month:%Y%m}" not in existing:
+                missing.append(self.osion_maaritys(month))
+
+        if missing and 'pmax' in existing:
+            self.db.suorita_paivitys(
+                f"ALTER TABLE high_scores REORGANIZE PARTITION pmax INTO "
+                f"({', '.join(missing)}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            )
+
+    def poista_vanhat_osiot(self, cutoff):
+
+        old = []
+        for name in self.osiot():
+            if not re.fullmatch(r'p\d{6}', name):
+                continue
+            month_end = _kuukauden_alku(int(name[1:5]), int(name[5:7]) + 1)
+            if month_end <= cutoff:
+                old.append(name)
+
+        # osiot ovat tässä vaiheessa jo tyhjiä, joten poisto ei vaikuta kyselyjen tuloksiin
+        if old:
+            self.db.suorita_paivitys(f"ALTER TABLE high_scores DROP PARTITION {', '.join(old)}")
+        return old
+
+
+def aja_yllapito(db, retention_months, partition):
+
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+    if not db.tarkista_asennus():
+        db.close()
+        return
+
+    try:
+        rolled_up, dropped = HighScoreMaintenance(db, retention_months).aja(partition)
+    finally:
+        db.close()
+
+    print(f"Koottu {rolled_up} vanhaa tulosriviä yhteenvetoihin")
+    if dropped:
+        print(f"Poistettu osiot: {', '.join(dropped)}")
+
+
+
+# RAPORTIT
+
+
+class ScoreReport:
+    """Koko high_scores-taulun jakaumat; rivit käsitellään paloittain, joten muistinkäyttö pysyy rajattuna"""
+
+    CHUNK_SIZE = 50000
+    PERCENTILES = (50, 75, 90, 95, 99)
+    RETENTION_DAYS = (1, 7, 30)
+
+    def __init__(self):
+        self.modes = list(GameMode)
+        self.histograms = [np.zeros(0, dtype=np.int64) for _ in self.modes]
+        self.hour_of_day = np.zeros(24, dtype=np.int64)
+        self.daily = {}
+        self.first_day = np.zeros(0, dtype=np.int64)
+        self.last_day = np.zeros(0, dtype=np.int64)
+        self.rows = 0
+        self.rollup_games = [0] * len(self.modes)
+        self.rollup_totals = [0] * len(self.modes)
+        self.rollup_best = [0] * len(self.modes)
+
+    def keraa(self, db):
+
+        placeholders = ','.join(['%s'] * len(self.modes))
+        sql = f"""
+              SELECT player_id, score, FIELD(game_mode, {placeholders}), UNIX_TIMESTAMP(played_at)
+              FROM high_scores
+              """
+        params = tuple(mode.value for mode in self.modes)
+
+        for rows in db.suorita_kysely_paloittain(sql, params, self.CHUNK_SIZE):
+            self.lisaa_pala(np.array(rows, dtype=np.int64))
+
+        # HighScoreMaintenance kokoaa vanhat rivit: niistä tiedetään vain määrät, summat ja ääripäät
+        sql = f"""
+              SELECT FIELD(game_mode, {placeholders}), SUM(games_played), SUM(score_total), MAX(best_score)
+              FROM high_score_rollup
+              GROUP BY game_mode
+              """
+        for code, games, total, best in db.suorita_kysely(sql, params):
+            if code:
+                self.rollup_games[code - 1] += int(games or 0)
+                self.rollup_totals[code - 1] += int(total or 0)
+                self.rollup_best[code - 1] = max(self.rollup_best[code - 1], int(best or 0))
+
+    def lisaa_pala(self, chunk):
+
+        player_ids, scores, mode_codes, timestamps = chunk.T
+        self.rows += len(chunk)
+
+        # FIELD() palauttaa 1-pohjaisen indeksin, 0 tuntemattomalle pelimuodolle
+        for code in range(1, len(self.modes) + 1):
+            mode_scores = np.clip(scores[mode_codes == code], 0, None)
+            if not len(mode_scores):
+                continue
+            counts = np.bincount(mode_scores)
+            histogram = self.histograms[code - 1]
+            if len(counts) > len(histogram):
+                histogram = np.concatenate([histogram, np.zeros(len(counts) - len(histogram), dtype=np.int64)])
+            histogram[:len(counts)] += counts
+            self.histograms[code - 1] = histogram
+
+        hours = timestamps // 3600
+        self.hour_of_day += np.bincount(hours % 24, minlength=24)
+
+        days = timestamps // 86400
+        unique_days, day_counts = np.unique(days, return_counts=True)
+        for day, count in zip(unique_days.tolist(), day_counts.tolist()):
+            self.daily[day] = self.daily.get(day, 0) + count
+
+        size = int(player_ids.max()) + 1
+        if size > len(self.first_day):
+            grow = size - len(self.first_day)
+            self.first_day = np.concatenate([self.first_day, np.full(grow, np.iinfo(np.int64).max)])
+            self.last_day = np.concatenate([self.last_day, np.full(grow, -1, dtype=np.int64)])
+        np.minimum.at(self.first_day, player_ids, days)
+        np.maximum.at(self.last_day, player_ids, days)
+
+    def persentiilit(self, histogram):
+
+        cumulative = np.cumsum(histogram)
+        total = cumulative[-1]
+        targets = np.array(self.PERCENTILES) / 100 * total
+        return dict(zip(self.PERCENTILES, np.searchsorted(cumulative, targets).tolist()))
+
+    def pysyvyys(self):
+
+        active = self.last_day >= 0
+        players = int(active.sum())
+        if not players:
+            return players, {}
+
+        spans = self.last_day[active] - self.first_day[active]
+        return players, {days: float((spans >= days).mean()) for days in self.RETENTION_DAYS}
+
+    def tulosta(self):
+
+        print("\n" + "=" * 60)
+        print(f" TILASTORAPORTTI ({self.rows + sum(self.rollup_games)} peliä) ")
+        print("=" * 60)
+
+        if any(self.rollup_games):
+            print(f"\nHuom: {sum(self.rollup_games)} vanhempaa peliä on koottu yhteenvetoihin. Ne sisältyvät")
+            print("pelimääriin, keskiarvoihin ja maksimeihin, mutta jakaumat, persentiilit,")
+            print("kellonajat ja pysyvyys lasketaan vain high_scores-taulun yksittäisistä riveistä.")
+
+        for index, (mode, histogram) in enumerate(zip(self.modes, self.histograms)):
+            games = int(histogram.sum())
+            rolled_up = self.rollup_games[index]
+            print(f"\n{mode.value}: {games + rolled_up} peliä" + (f" (joista {rolled_up} koottuja)" if rolled_up else ""))
+            if not games + rolled_up:
+                continue
+
+            total = float((histogram * np.arange(len(histogram))).sum()) + self.rollup_totals[index]
+            best = max(len(histogram) - 1, self.rollup_best[index])
+            print(f"  keskiarvo {total / (games + rolled_up):.1f}  max {best}")
+            if not games:
+                continue
+
+            percentiles = "  ".join(f"p{p}={value}" for p, value in self.persentiilit(histogram).items())
+            print(f"  yksittäiset rivit: {percentiles}")
+
+            edges = np.linspace(0, len(histogram), num=min(10, len(histogram)) + 1).astype(int)
+            buckets = np.add.reduceat(histogram, edges[:-1])
+            widest = max(int(buckets.max()), 1)
+            for start, end, count in zip(edges[:-1], edges[1:], buckets.tolist()):
+                print(f"  {start:5}-{end - 1:<5} {'#' * round(40 * count / widest):40} {count}")
+
+        print("\nPelit kellonajoittain (UTC):")
+        widest = max(int(self.hour_of_day.max()), 1)
+        for hour, count in enumerate(self.hour_of_day.tolist()):
+            print(f"  {hour:02}:00 {'#' * round(40 * count / widest):40} {count}")
+
+        if self.daily:
+            days = len(self.daily)
+            print(f"\nPelejä tunnissa keskimäärin: {self.rows / (days * 24):.1f} ({days} päivää, jolloin pelattiin)")
+
+        players, retention = self.pysyvyys()
+        print(f"\nPysyvyys ({players} pelaajaa, osuus jotka pelasivat vielä N päivää ensimmäisen pelin jälkeen):")
+        for days, share in retention.items():
+            print(f"  {days:3} pv: {share * 100:5.1f} %")
+
+
+def aja_raportti(db):
+
+    if np is None:
+        print("Raportti vaatii NumPy-kirjaston (pip install numpy)")
+        return
+
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+    if not db.tarkista_asennus():
+        db.close()
+        return
+
+    start = time.perf_counter()
+    report = ScoreReport()
+    try:
+        report.keraa(db)
+    finally:
+        db.close()
+
+    report.tulosta()
+    print(f"\nRaportti laskettu {time.perf_counter() - start:.1f} sekunnissa")
+
+
+
+def aja_vaikeimmat(db, limit=15):
+
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+    if not db.tarkista_asennus():
+        db.close()
+        return
+
+    try:
+        for question_type, title in ((QuestionType.AIRPORT_ELEVATION, "LENTOKENTÄT"),
+                                     (QuestionType.COUNTRY_POPULATION, "MAAT")):
+            print("\n" + "=" * 60)
+            print(f" VAIKEIMMAT KOHTEET - {title} ")
+            print("=" * 60)
+
+            items = db.etsi_vaikeimmat_kohteet(question_type, limit)
+            if not items:
+                print("Ei vielä tarpeeksi arvauksia!")
+            for i, item in enumerate(items, 1):
+                attempts = item['correct'] + item['incorrect']
+                print(f"{i:2}. {item['name'][:40]:40} {item['error_rate'] * 100:5.1f} % väärin ({attempts} arvausta)")
+    finally:
+        db.close()
+
+
+
+# TILASTOPALVELIN
+
+
+def _json_oletus(value):
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tuntematon tyyppi: {type(value).__name__}")
+
+
+class JsonSnapshot:
+    """Valmiiksi koodattu JSON-vastaus ETagilla; gzip-versio luodaan ensimmäisellä pyynnöllä"""
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.gzip_body = None
+
+    @classmethod
+    def from_data(cls, data):
+
+        return cls(json.dumps(data, default=_json_oletus, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def get_gzip_body(self):
+
+        if self.gzip_body is None:
+            self.gzip_body = gzip.compress(self.body, compresslevel=6)
+        return self.gzip_body
+
+
+class LeaderboardSnapshots:
+
+    def __init__(self, db, interval=60.0, check_interval=2.0, limit=10):
+        self.db = db
+        self.interval = interval
+        self.check_interval = check_interval
+        self.limit = limit
+        self.snapshots = {}
+        self.viimeisin_score_id = None
+        self.usernames = UsernameIndex()
+        self.muuttunut = threading.Event()
+
+    def merkitse_muuttuneeksi(self, *args):
+
+        self.muuttunut.set()
+
+    def aseta(self, path, data):
+
+        snapshot = JsonSnapshot.from_data(data)
+        previous = self.snapshots.get(path)
+        # muuttumaton vastaus säilyttää ETaginsa ja jo pakatun gzip-version
+        if previous is None or previous.body != snapshot.body:
+            self.snapshots[path] = snapshot
+
+    def paivita(self):
+        """Rakentaa kaikki tilannekuvat; epäonnistunut kysely jättää edelliset voimaan"""
+
+        latest_id = self.db.hae_viimeisin_score_id()
+        if self.db.viimeisin_virhe:
+            return False
+
+        stats = self.db.etsi_kaikkien_tilastot()
+        if self.db.viimeisin_virhe:
+            return False
+
+        for player_id, player_stats in stats.items():
+            self.aseta(f"/players/{player_id}/stats", dict(player_stats, player_id=player_id))
+        self.viimeisin_score_id = latest_id
+        self.paivita_listat()
+        return True
+
+    def paivita_listat(self):
+
+        for mode in GameMode:
+            scores = self.db.etsi_top_scoret(self.limit, mode.value)
+            if not self.db.viimeisin_virhe:
+                self.aseta(f"/leaderboard/{mode.value}", {'game_mode': mode.value, 'scores': scores})
+
+        for question_type in QuestionType:
+            items = self.db.etsi_vaikeimmat_kohteet(question_type, self.limit)
+            if not self.db.viimeisin_virhe:
+                self.aseta(f"/items/hardest/{question_type.value}",
+                           {'question_type': question_type.value, 'items': items})
+
+    def paivita_pelaajat(self, player_ids):
+        """Rakentaa uudelleen vain annettujen pelaajien tilastot"""
+
+        stats = self.db.etsi_kaikkien_tilastot(player_ids)
+        if self.db.viimeisin_virhe:
+            return False
+
+        for player_id, player_stats in stats.items():
+            self.aseta(f"/players/{player_id}/stats", dict(player_stats, player_id=player_id))
+        return True
+
+    def get(self, path):
+
+        return self.snapshots.get(path)
+
+    def aja_paivityssilmukka(self, stop_event):
+
+        # uudet pelaajat ja pelaajat, joiden tilastojen uudelleenrakennus on vielä tekemättä
+        pending = set()
+        next_list_refresh = time.time() + self.interval
+        while not stop_event.is_set():
+            try:
+                pending.update(self.usernames.lataa(self.db))
+            except mysql.connector.Error:
+                pass
+
+            if self.viimeisin_score_id is None:
+                # käynnistyksen täysi rakennus epäonnistui: yritetään uudelleen
+                self.muuttunut.clear()
+                if self.paivita():
+                    pending.clear()
+                self.muuttunut.wait(self.check_interval)
+                continue
+
+            changed = self.db.hae_muuttuneet_pelaajat(self.viimeisin_score_id)
+            if not self.db.viimeisin_virhe:
+                pending.update(changed)
+                if pending and self.paivita_pelaajat(pending):
+                    pending.clear()
+                    if changed:
+                        self.viimeisin_score_id = max(self.viimeisin_score_id, *changed.values())
+
+                if changed or self.muuttunut.is_set() or time.time() >= next_list_refresh:
+                    self.muuttunut.clear()
+                    self.paivita_listat()
+                    next_list_refresh = time.time() + self.interval
+
+            self.muuttunut.wait(self.check_interval)
+
+
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+
+    server_version = "HigherOrLower/1.0"
+
+    def do_GET(self):
+
+        self.vastaa(include_body=True)
+
+    def do_HEAD(self):
+
+        self.vastaa(include_body=False)
+
+    def vastaa(self, include_body):
+
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        if path == '/players/search':
+            prefix = parse_qs(url.query).get('prefix', [''])[0]
+            usernames = self.server.snapshots.usernames.hae(prefix)
+            snapshot = JsonSnapshot.from_data({'prefix': prefix, 'usernames': usernames})
+        else:
+            snapshot = self.server.snapshots.get(path)
+
+        if snapshot is None:
+            body = b'{"error":"not found"}'
+            self.send_response(404)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+            return
+
+        if self.etag_vastaa(snapshot.etag):
+            self.send_response(304)
+            self.send_header('ETag', snapshot.etag)
+            self.send_header('Cache-Control', self.server.cache_control)
+            self.end_headers()
+            return
+
+        body = snapshot.body
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if use_gzip:
+            body = snapshot.get_gzip_body()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', snapshot.etag)
+        self.send_header('Cache-Control', self.server.cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def etag_vastaa(self, etag):
+
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+    def log_message(self, format, *args):
+        pass
+
+
+def aja_tilastopalvelin(db, host="0.0.0.0", port=8080, interval=60.0):
+
+    # palvelin vain lukee: ilman autocommitia yhteys näkisi saman tilannekuvan koko ajan
+    db.config['autocommit'] = True
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+    if not db.tarkista_asennus():
+        db.close()
+        return
+
+    # muuttuneiden tulosten raja ja pelaajien tilastot luetaan samasta kopiosta: kierrättäessä raja voisi
+    # ohittaa tuloksen, jota tilastot lukeva kopio ei ole vielä saanut
+    db.kiinnita_lukuyhteys()
+    snapshots = LeaderboardSnapshots(db, interval=interval)
+    # hakemisto ladataan ja lajitellaan ennen ensimmäistä pyyntöä; täysi rakennus kattaa nämä pelaajat
+    snapshots.usernames.lataa(db)
+    snapshots.paivita()
+
+    stop_event = threading.Event()
+    threading.Thread(target=snapshots.aja_paivityssilmukka, args=(stop_event,), daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), SnapshotRequestHandler)
+    server.snapshots = snapshots
+    server.cache_control = f"public, max-age={int(snapshots.check_interval)}"
+
+    print(f"Tilastopalvelin käynnissä: http://{host}:{port}/leaderboard/classic")
+    try:
+        server.serve_forever()
+    finally:
+        stop_event.set()
+        snapshots.merkitse_muuttuneeksi()
+        server.server_close()
+        db.close()
+
+
+
 # PÄÄOHJELMA
 
 
 class HigherOrLowerGame:
     """Pääsovellus"""
 
-    def __init__(self):
-        self.db = DatabaseManager()
-        self.game = GameEngine(self.db)
+    def __init__(self, tracer=None, db=None):
+        self.db = db or DatabaseManager()
+        self.tracer = tracer or Tracer()
+        self.game = GameEngine(self.db, self.tracer)
+        self.game.checkpoints_enabled = True
         self.menu_renderer = MenuRenderer()
         self.game_display = GameDisplay()
         self.statistics_renderer = StatisticsRenderer()
@@ -695,12 +2561,21 @@ class HigherOrLowerGame:
 
         if not self.db.connect():
             return
-
-        if not self._login_or_register():
+        if not self.db.tarkista_asennus():
             self.db.close()
             return
 
-        self._main_loop()
+        self.db.kayttajanimi_indeksi = UsernameIndex()
+        self.db.kayttajanimi_indeksi.lataa(self.db)
+
+        try:
+            if self._login_or_register():
+                self._main_loop()
+        finally:
+            # myös Ctrl+C:llä keskeytettäessä viimeisin pelitilanne ja arvaustilastot kirjoitetaan kantaan
+            self.game.tallenna_checkpoint()
+            self.game.tarkkuus.tyhjenna(self.db)
+            self.db.close()
 
 
     def _login_or_register(self):
@@ -710,11 +2585,15 @@ class HigherOrLowerGame:
         print("=" * 60)
 
         while True:
-            username = input("\nAnna käyttäjänimesi (tai 'q' lopettaaksesi): ").strip()
+            username = input("\nAnna käyttäjänimesi (tai 'q' lopettaaksesi, 'abc*' näyttää ehdotukset): ").strip()
 
             if username.lower() == 'q':
                 return False
 
+            if username.endswith('*'):
+                self.nayta_ehdotukset(username[:-1])
+                continue
+
             if not username:
                 print("Käyttäjänimi ei voi olla tyhjä!")
                 continue
@@ -734,6 +2613,14 @@ class HigherOrLowerGame:
             else:
                 print("Virhe käyttäjän luonnissa. Yritä toista nimeä.")
 
+    def nayta_ehdotukset(self, prefix):
+
+        suggestions = self.db.kayttajanimi_indeksi.hae(prefix)
+        if suggestions:
+            print("Löytyi: " + ", ".join(suggestions))
+        else:
+            print(f"Ei käyttäjiä, joiden nimi alkaa '{prefix}'")
+
     def _main_loop(self):
 
         while True:
@@ -757,10 +2644,11 @@ class HigherOrLowerGame:
             else:
                 print("Virheellinen valinta!")
 
-        self.db.close()
-
     def handle_play_option(self):
 
+        if self.jatka_keskeneraista_pelia():
+            return
+
         game_mode = self.valitse_pelimoodi()
         if not game_mode:
             return
@@ -769,8 +2657,30 @@ class HigherOrLowerGame:
         if not question_type:
             return
 
+        if game_mode == GameMode.RACE:
+            self.pelaa_kilpailua(question_type)
+            return
+
         self.pelaa_pelia(game_mode, question_type)
 
+    def jatka_keskeneraista_pelia(self):
+
+        data = self.db.hae_checkpoint(self.player_id)
+        if not data:
+            return False
+
+        choice = input("\nSinulla on keskeneräinen peli. Jatketaanko sitä? (k/e): ").strip().lower()
+        if choice != 'k':
+            self.db.poista_checkpoint(self.player_id)
+            return False
+
+        if not self.game.palauta_checkpoint(data) or not self.validate_game_start():
+            self.db.poista_checkpoint(self.player_id)
+            return False
+
+        self.aja_peli_loop(self.game.state.question_type)
+        return True
+
     def valitse_pelimoodi(self):
 
         while True:
@@ -783,6 +2693,8 @@ class HigherOrLowerGame:
             elif choice == '3':
                 return GameMode.TIME_ATTACK
             elif choice == '4':
+                return GameMode.RACE
+            elif choice == '5':
                 return None
 
     def valitse_kysymystyyppi(self):
@@ -824,6 +2736,11 @@ class HigherOrLowerGame:
             print("Klassinen tila - 3 elämää\nArvaa, onko seuraava arvo HIGHER vai LOWER!")
         elif game_mode == GameMode.SUDDEN_DEATH:
             print("ÄKKIKUOLEMA - 1 elämä!\nYksi virhe päättää pelin!")
+        elif game_mode == GameMode.RACE:
+            print(f"KILPAILU - 3 elämää, vuorotellen samalla koneella!\n"
+                  f"Kaikki vastaavat ensin, tulokset näytetään kierroksen lopuksi.\n"
+                  f"Kaikilla samat kysymykset. Ensimmäinen {self.game.settings.RACE_TARGET} pisteeseen voittaa "
+                  f"ja kilpailu päättyy kaikilta.")
         else:
             print("AIKARAJA - 60 sekuntia!\n1 elämä, 60 sekuntia aikaa!")
 
@@ -841,12 +2758,14 @@ class HigherOrLowerGame:
         while not self.game.state.game_over and not self.quit_requested:
             display_info = self.game.get_current_display()
 
-            self.game_display.show_game_header(display_info)
-            self.game_display.show_game_content(display_info, question_type)
+            with self.tracer.span('render'):
+                self.game_display.show_game_header(display_info)
+                self.game_display.show_game_content(display_info, question_type)
 
             player_choice = self.get_player_input()
             if player_choice == 'q':
                 self.quit_requested = True
+                self.game.tallenna_checkpoint()
                 print("\nPeli keskeytetty.")
                 return
 
@@ -879,6 +2798,84 @@ class HigherOrLowerGame:
         if not correct and not self.game.state.game_over:
             input("\nPaina Enter jatkaaksesi...")
 
+    def pelaa_kilpailua(self, question_type):
+
+        players = [(self.player_id, self.username)] + self.kysy_kilpailijat()
+        if len(players) < 2:
+            print("Kilpailuun tarvitaan vähintään kaksi pelaajaa!")
+            return
+
+        self.Peli_intro(GameMode.RACE, question_type)
+        input("Paina Enter aloittaaksesi...")
+
+        room = RaceRoom(self.db, question_type, tracer=self.tracer)
+        engines = [room.liity(player_id, username) for player_id, username in players]
+        if not all(engine.state.current_item and engine.state.next_item for engine in engines):
+            print("\nVirhe: Ei voitu hakea tietoja!")
+            return
+
+        try:
+            self.aja_kilpailu(room, question_type)
+        finally:
+            room.source.tarkkuus.tyhjenna(self.db)
+
+    def aja_kilpailu(self, room, question_type):
+
+        while not room.on_paattynyt():
+            self.nayta_kilpailun_tilanne(room.tilanne())
+
+            # kaikki vastaavat ennen kuin yhtään tulosta näytetään, koska seuraava kohde on kaikille sama
+            choices = []
+            for engine in room.mukana():
+                display_info = engine.get_current_display()
+                with self.tracer.span('render'):
+                    self.game_display.show_game_header(display_info)
+                    self.game_display.show_game_content(display_info, question_type)
+
+                choice = self.get_player_input()
+                if choice == 'q':
+                    print("\nKilpailu keskeytetty.")
+                    return
+                choices.append((engine, choice == 'h'))
+
+            print(f"\n KIERROS {room.kierros + 1} ")
+            for engine, correct, message in room.pelaa_kierros(choices):
+                print(f"\n{engine.state.player_username}: {'✓' if correct else '✗'} {message}")
+
+        print("\nKILPAILU PÄÄTTYI!")
+        self.nayta_kilpailun_tilanne(room.tilanne())
+        input("\nPaina Enter palataksesi valikkoon...")
+
+    def kysy_kilpailijat(self):
+
+        players = []
+        names = {self.username.casefold()}
+        while True:
+            username = input("\nLisää kilpailija (Enter aloittaa kilpailun): ").strip()
+            if not username:
+                return players
+
+            if len(username) < 3:
+                print("Käyttäjänimen pitää olla vähintään 3 merkkiä!")
+                continue
+            if username.casefold() in names:
+                print("Pelaaja on jo mukana!")
+                continue
+
+            player_id = self.db.etsi_tai_luo_pelaaja(username)
+            if player_id:
+                players.append((player_id, username))
+                names.add(username.casefold())
+
+    def nayta_kilpailun_tilanne(self, scoreboard):
+
+        print("\n" + "=" * 60)
+        print(" TILANNE ")
+        for i, entry in enumerate(scoreboard, 1):
+            status = " (maalissa)" if entry['finished'] else " (ulkona)" if entry['game_over'] else ""
+            print(f"{i:2}. {entry['username']:20} {entry['score']:4} pistettä  elämät {entry['lives']}{status}")
+        print("=" * 60)
+
     def handle_game_end(self):
 
         if (self.game.state.game_over and
@@ -896,12 +2893,124 @@ class HigherOrLowerGame:
             self.statistics_renderer.nayta_pistetaulukko(self.db, 'sudden_death')
         elif choice == '3':
             self.statistics_renderer.nayta_pistetaulukko(self.db, 'time_attack')
+        elif choice == '4':
+            self.statistics_renderer.nayta_pistetaulukko(self.db, 'race')
+        elif choice == '5':
+            self.etsi_pelaaja()
+
+    def etsi_pelaaja(self):
+
+        prefix = input("\nKäyttäjänimen alku: ").strip()
+        matches = self.db.kayttajanimi_indeksi.hae(prefix)
+        if not matches:
+            print(f"Ei käyttäjiä, joiden nimi alkaa '{prefix}'")
+            return
+
+        for i, username in enumerate(matches, 1):
+            print(f"{i:2}. {username}")
+
+        choice = input(f"\nValitse (1-{len(matches)}) tai Enter palataksesi: ").strip()
+        if not choice.isdigit() or not 1 <= int(choice) <= len(matches):
+            return
+
+        player = self.db.etsi_pelaaja_kayttajanimella(matches[int(choice) - 1])
+        if player:
+            self.statistics_renderer.nayta_pelaajan_tilastot(self.db, player['id'], player['username'])
+
+
+def aja_asennus(db):
+
+    if not db.connect():
+        print("Tietokantayhteys epäonnistui!")
+        return
+
+    try:
+        if not db.luo_lisataulut():
+            return
+
+        # kysymystaulut johdetaan flight_game-kannan lähdetauluista, ellei niitä ole jo tuotu CSV:stä
+        if not db.suorita_kysely("SHOW TABLES LIKE 'game_airport'", primary=True):
+            airports, countries = DatasetImporter(db).rakenna_lahdetauluista()
+            print(f"Kysymystauluihin koottu {airports} lentokenttää ja {countries} maata")
+        print("Pelin taulut ovat valmiina")
+    finally:
+        db.close()
+
+
+def aja_profiloituna(db, output_path):
+
+    tracer = Tracer(enabled=True)
+    profiler = cProfile.Profile()
+    game = HigherOrLowerGame(tracer, db)
+
+    profiler.enable()
+    try:
+        game.run()
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_path)
+
+        print("\n" + "=" * 60)
+        print(" PROFILOINTI ")
+        print("=" * 60)
+        print(tracer.yhteenveto())
+        print(f"\nProfiili tallennettu: {output_path} (esim. snakeviz tai flameprof)")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
 
 
 def main():
 
+    parser = argparse.ArgumentParser(description="Higher or Lower -peli")
+    parser.add_argument('--db-host', default="127.0.0.1", help="pääkannan (kirjoitukset) osoite")
+    parser.add_argument('--db-port', type=int, default=3306, help="pääkannan portti")
+    parser.add_argument('--replica', action='append', default=[], metavar="HOST[:PORT]",
+                        help="lukukopio, jolle luvut ohjataan (voi antaa useita)")
+    parser.add_argument('--setup', action='store_true', help="luo pelin omat taulut (ajetaan kerran ennen käyttöönottoa)")
+    parser.add_argument('--serve', action='store_true', help="käynnistä pistetaulukoiden ja tilastojen HTTP-palvelin")
+    parser.add_argument('--host', default="0.0.0.0", help="palvelimen osoite (oletus 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=8080, help="palvelimen portti (oletus 8080)")
+    parser.add_argument('--refresh', type=float, default=60.0, help="tilastojen täyspäivityksen väli sekunteina")
+    parser.add_argument('--import-data', nargs=2, metavar=('AIRPORTS_CSV', 'COUNTRIES_CSV'),
+                        help="tuo lentokenttä- ja maa-aineisto CSV-tiedostoista")
+    parser.add_argument('--report', action='store_true', help="tulosta koko pistetaulun tilastoraportti (vaatii NumPy)")
+    parser.add_argument('--hardest', action='store_true', help="tulosta kohteet, joissa arvataan useimmin väärin")
+    parser.add_argument('--maintain', action='store_true', help="kokoa säilytysajan ylittäneet tulokset yhteenvetoihin")
+    parser.add_argument('--retention-months', type=int, default=6, help="kuinka monta kuukautta yksittäiset tulokset säilytetään")
+    parser.add_argument('--partition', action='store_true', help="osioi high_scores kuukausittain ja pelimuodoittain (--maintain)")
+    parser.add_argument('--profile', action='store_true', help="pelaa profiloituna ja tulosta vaihekohtaiset ajat")
+    parser.add_argument('--profile-output', default="higher_or_lower.prof", help="cProfile-tiedoston polku")
+    args = parser.parse_args()
+
+    replicas = []
+    for replica in args.replica:
+        host, _, port = replica.partition(':')
+        replicas.append({'host': host, 'port': int(port) if port else args.db_port})
+    db = DatabaseManager(host=args.db_host, port=args.db_port, read_replicas=replicas)
+
     try:
-        game = HigherOrLowerGame()
+        if args.setup:
+            aja_asennus(db)
+            return
+        if args.serve:
+            aja_tilastopalvelin(db, args.host, args.port, args.refresh)
+            return
+        if args.import_data:
+            tuo_aineisto(db, *args.import_data)
+            return
+        if args.report:
+            aja_raportti(db)
+            return
+        if args.hardest:
+            aja_vaikeimmat(db)
+            return
+        if args.maintain:
+            aja_yllapito(db, args.retention_months, args.partition)
+            return
+        if args.profile:
+            aja_profiloituna(db, args.profile_output)
+            return
+
+        game = HigherOrLowerGame(db=db)
         game.run()
     except KeyboardInterrupt:
         print("\n\nPeli keskeytetty. Näkemiin!")
@@ -912,4 +3021,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
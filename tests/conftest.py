@@ -0,0 +1,16 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("mysql.connector")
+
+SOURCE = Path(__file__).resolve().parent.parent / "Higher or lower.py"
+
+
+@pytest.fixture(scope="session")
+def game():
+    spec = importlib.util.spec_from_file_location("higher_or_lower", SOURCE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
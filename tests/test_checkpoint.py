@@ -0,0 +1,114 @@
+import pytest
+
+
+class ItemDB:
+    """Muistissa oleva kohdeaineisto GameEnginen tarvitsemille kyselyille"""
+
+    def __init__(self, size=30):
+        self.airports = {key: {'id': key, 'name': f"A{key}", 'elevation_ft': key * 10} for key in range(1, size + 1)}
+        self.checkpoints = []
+
+    def hae_lentokenttien_idt(self):
+        return sorted(self.airports)
+
+    def etsi_lentokentta(self, key):
+        return self.airports.get(key)
+
+    def etsi_pelaajan_highscore(self, player_id, game_mode):
+        return 4
+
+    def tallenna_checkpoint(self, player_id, data):
+        self.checkpoints.append(data)
+
+    def tallenna_score(self, *args):
+        pass
+
+    def poista_checkpoint(self, player_id):
+        pass
+
+
+@pytest.fixture
+def engine(game):
+    engine = game.GameEngine(ItemDB())
+    engine.checkpoints_enabled = True
+    engine.aloita_uusi_peli(7, "Pelaaja ÄÖ", game.QuestionType.AIRPORT_ELEVATION, game.GameMode.CLASSIC)
+    return engine
+
+
+def test_game_state_round_trip(game):
+    state = game.GameState()
+    state.score, state.lives, state.high_score = 12, 2, 30
+    state.question_type = game.QuestionType.COUNTRY_POPULATION
+    state.game_mode = game.GameMode.TIME_ATTACK
+    state.player_id, state.player_username = 99, "Åsa"
+    state.show_current_value, state.first_guess = True, False
+    state.time_remaining = 12.5
+
+    data = state.pack() + b'rest'
+    restored, offset = game.GameState.unpack(data)
+
+    assert data[offset:] == b'rest'
+    for name in game.GameState.__slots__:
+        assert getattr(restored, name) == getattr(state, name), name
+
+
+def test_game_state_rejects_unknown_version(game):
+    data = bytearray(game.GameState().pack())
+    data[0] = 99
+
+    with pytest.raises(ValueError):
+        game.GameState.unpack(data)
+
+
+def test_item_pool_round_trip(game):
+    pool = game.ItemPool(range(20))
+    for _ in range(7):
+        pool.draw()
+
+    restored = game.ItemPool(range(20))
+    data = pool.pack()
+    assert restored.unpack(data) == len(data)
+    assert restored.used.bits == pool.used.bits
+    assert restored.used.count == pool.used.count
+    assert restored.recent == pool.recent
+
+
+@pytest.mark.parametrize("keys, cut", [(range(21), 0), (range(20), 3)])
+def test_item_pool_unpack_resets_on_changed_or_truncated_data(game, keys, cut):
+    pool = game.ItemPool(range(20))
+    for _ in range(7):
+        pool.draw()
+    data = pool.pack()
+
+    restored = game.ItemPool(keys)
+    restored.unpack(data[:len(data) - cut])
+    assert restored.used.count == 0
+    assert restored.recent == []
+
+
+def test_engine_checkpoint_restores_items_and_pool(game, engine):
+    engine.arvaus(True)
+    data = engine.luo_checkpoint()
+
+    resumed = game.GameEngine(engine.db)
+    assert resumed.palauta_checkpoint(data)
+    assert resumed.state.score == engine.state.score
+    assert resumed.state.lives == engine.state.lives
+    assert resumed.state.player_username == "Pelaaja ÄÖ"
+    assert resumed.state.current_item == engine.state.current_item
+    assert resumed.state.next_item == engine.state.next_item
+    assert resumed.get_item_pool().used.bits == engine.get_item_pool().used.bits
+
+
+def test_every_guess_writes_a_checkpoint(game, engine):
+    written = len(engine.db.checkpoints)
+    engine.arvaus(True)
+    engine.arvaus(False)
+
+    assert len(engine.db.checkpoints) == written + 2
+    state, _ = game.GameState.unpack(engine.db.checkpoints[-1])
+    assert (state.score, state.lives) == (engine.state.score, engine.state.lives)
+
+
+def test_truncated_checkpoint_is_rejected(game, engine):
+    assert not game.GameEngine(engine.db).palauta_checkpoint(engine.luo_checkpoint()[:10])
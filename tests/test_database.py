@@ -0,0 +1,100 @@
+import mysql.connector
+import pytest
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=()):
+        if self.connection.query_error:
+            raise self.connection.query_error
+
+    def fetchall(self):
+        return self.connection.rows
+
+    def fetchmany(self, size):
+        rows, self.connection.rows = self.connection.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self, rows=(), dead=False, query_error=None):
+        self.rows = list(rows)
+        self.dead = dead
+        self.query_error = query_error
+
+    def cursor(self, **kwargs):
+        if self.dead:
+            raise mysql.connector.OperationalError(msg="MySQL Connection not available.")
+        return FakeCursor(self)
+
+
+@pytest.fixture
+def db(game):
+    db = game.DatabaseManager()
+    db.connection = FakeConnection(rows=[('primary',)])
+    return db
+
+
+def test_dead_replica_falls_back_to_primary_and_is_dropped(db):
+    db.read_connections = [FakeConnection(dead=True)]
+
+    assert db.suorita_kysely("SELECT 1") == [('primary',)]
+    assert db.viimeisin_virhe is None
+    assert db.read_connections == []
+
+
+def test_query_error_on_replica_keeps_the_replica(db):
+    replica = FakeConnection(query_error=mysql.connector.ProgrammingError(msg="no such table"))
+    db.read_connections = [replica]
+
+    assert db.suorita_kysely("SELECT 1") == [('primary',)]
+    assert db.read_connections == [replica]
+
+
+def test_chunked_query_falls_back_to_primary(db):
+    db.read_connections = [FakeConnection(dead=True)]
+
+    assert list(db.suorita_kysely_paloittain("SELECT 1")) == [[('primary',)]]
+    assert db.read_connections == []
+
+
+def test_primary_failure_is_recorded(db):
+    db.connection = FakeConnection(dead=True)
+
+    assert db.suorita_kysely("SELECT 1") == []
+    assert isinstance(db.viimeisin_virhe, mysql.connector.OperationalError)
+
+
+def test_pinned_read_connection_is_used_until_it_drops(db):
+    first, second = FakeConnection(rows=[('first',)]), FakeConnection(rows=[('second',)])
+    db.read_connections = [first, second]
+    db.kiinnita_lukuyhteys()
+    pinned = db.kiinnitetty_lukuyhteys
+
+    assert {db.suorita_kysely("SELECT 1")[0] for _ in range(4)} == {pinned.rows[0]}
+
+    pinned.dead = True
+    assert db.suorita_kysely("SELECT 1") == [('primary',)]
+    assert db.kiinnitetty_lukuyhteys is db.connection
+
+
+def test_missing_setup_tables_are_reported(db, capsys):
+    db.connection = FakeConnection(rows=[('game_airport',), (bytearray(b'game_country'),), ('players',)])
+
+    assert not db.tarkista_asennus()
+    output = capsys.readouterr().out
+    assert 'high_score_rollup' in output and 'game_airport' not in output
+    assert '--setup' in output
+
+
+def test_complete_setup_passes(db):
+    db.connection = FakeConnection(rows=[(table,) for table in db.ASENNUKSEN_TAULUT])
+
+    assert db.tarkista_asennus()
@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.mark.parametrize("size", [2, 3, 5, 40])
+def test_item_pool_never_repeats_the_previous_item_across_recycling(game, size):
+    pool = game.ItemPool(range(size))
+    drawn = [pool.draw() for _ in range(size * 20)]
+
+    assert all(previous != item for previous, item in zip(drawn, drawn[1:]))
+    assert set(drawn) == set(range(size))
+
+
+@pytest.mark.parametrize("size", [1, 7, 8, 9, 64, 100])
+def test_exclusion_set_fills_up_without_reporting_padding_bits(game, size):
+    used = game.ExclusionSet(size)
+
+    seen = set()
+    while not used.is_full():
+        index = used.find_free(size // 2)
+        assert 0 <= index < size and index not in seen
+        used.add(index)
+        seen.add(index)
+
+    assert seen == set(range(size))
+    assert used.find_free() is None
+
+
+def test_exclusion_set_add_is_idempotent_and_clear_resets(game):
+    used = game.ExclusionSet(10)
+    used.add(3)
+    used.add(3)
+
+    assert 3 in used and 4 not in used
+    assert used.count == 1
+
+    used.clear()
+    assert 3 not in used
+    assert used.count == 0
+
+
+def test_item_pool_draws_every_item_once_per_round(game):
+    pool = game.ItemPool(range(50))
+
+    assert sorted(pool.draw() for _ in range(50)) == list(range(50))
+    assert pool.used.is_full()
+
+
+def test_empty_item_pool_draws_nothing(game):
+    assert game.ItemPool([]).draw() is None
@@ -0,0 +1,49 @@
+import ast
+from datetime import date, datetime
+
+from conftest import SOURCE
+
+
+class RecordingDB:
+
+    def __init__(self):
+        self.queries = []
+
+    def suorita_kysely(self, query, params=None, primary=False):
+        self.queries.append(query)
+        if 'PARTITION_NAME' in query:
+            return [('p202001',), ('pmax',)]
+        if 'DATA_TYPE' in query:
+            return [('datetime',)]
+        if 'REFERENTIAL_CONSTRAINTS' in query:
+            return [('high_scores_ibfk_1',)]
+        if 'MIN(played_at)' in query:
+            return [(datetime(2025, 1, 5),)]
+        return []
+
+    def suorita_paivitys(self, query, params=None):
+        self.queries.append(query)
+        return True
+
+
+def test_sql_literals_have_no_literal_backslash_continuations():
+    tree = ast.parse(SOURCE.read_text(encoding='utf-8'))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            assert "\\\n" not in node.value, f"rivi {node.lineno}"
+
+
+def test_maintenance_sql_has_no_stray_backslash(game):
+    db = RecordingDB()
+    maintenance = game.HighScoreMaintenance(db, retention_months=6)
+
+    assert maintenance.on_osioitu()
+    assert maintenance.aikasarakkeen_tyyppi() == 'datetime'
+    maintenance.osioi()
+    maintenance.lisaa_tulevat_osiot()
+    assert maintenance.poista_vanhat_osiot(date(2025, 1, 1)) == ['p202001']
+
+    assert db.queries
+    for query in db.queries:
+        assert '\\' not in query, query
+    assert any('DROP FOREIGN KEY `high_scores_ibfk_1`' in query for query in db.queries)
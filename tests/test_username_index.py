@@ -0,0 +1,42 @@
+class ChunkedDB:
+
+    def __init__(self, players):
+        self.players = players
+
+    def suorita_kysely_paloittain(self, query, params=None, chunk_size=10000):
+        rows = [row for row in self.players if row[0] > params[0]]
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+
+def test_prefix_search_is_case_insensitive_and_sorted(game):
+    index = game.UsernameIndex()
+    for name in ["matti", "Maija", "MATTI2", "pekka", "mauno"]:
+        index.lisaa(name)
+
+    assert index.hae("ma") == ["Maija", "matti", "MATTI2", "mauno"]
+    assert index.hae("MAT") == ["matti", "MATTI2"]
+    assert index.hae("x") == []
+    assert index.hae("ma", limit=2) == ["Maija", "matti"]
+
+
+def test_adding_a_name_twice_keeps_one_entry(game):
+    index = game.UsernameIndex()
+    index.lisaa("Aino", player_id=5)
+    index.lisaa("Aino")
+
+    assert index.hae("") == ["Aino"]
+    assert index.max_id == 5
+
+
+def test_load_returns_only_players_added_after_the_first_load(game):
+    db = ChunkedDB([(1, "pekka"), (2, "Anna"), (3, "anni")])
+    index = game.UsernameIndex()
+    index.LOAD_CHUNK = 2
+
+    assert index.lataa(db) == []
+    assert index.hae("an") == ["Anna", "anni"]
+
+    db.players.append((4, "Antti"))
+    assert index.lataa(db) == [4]
+    assert index.hae("an") == ["Anna", "anni", "Antti"]